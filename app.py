@@ -1,19 +1,24 @@
 import streamlit as st
+import asyncio
 import csv
 import json
 from genomics_interpreter import (
+    CHAT_CONTEXT_TOKEN_BUDGET,
     TRAIT_DB_PATH,
+    cache_version,
+    generate_lifestyle_plan_stream,
     load_trait_database,
-    parse_genotype_file,
-    match_traits,
-    build_report_object,
-    generate_ai_summary,
-    generate_text_report,
-    generate_html_report,
+    resolve_effect_score,
+    run_report_pipeline,
+    stream_chat_completion,
+    trait_db_version,
 )
-from openai import OpenAI
-
-client = OpenAI()  # uses your OPENAI_API_KEY
+from chat_context import ConversationContext
+from llm_client import friendly_error_message
+from pdf_report import render_pdf_report
+from trait_retrieval import TraitIndex
+from rate_limiter import PRIORITY_CHAT
+from report_store import ReportStore, genome_hash
 
 # ---------- Page config ----------
 st.set_page_config(
@@ -970,6 +975,87 @@ def load_trait_rows_from_csv(path: str):
         st.error(f"Could not load trait database from {path}: {e}")
     return rows
 
+@st.cache_resource
+def get_trait_lookup(db_version):
+    """Parsed trait database, reloaded only when its files change."""
+    return load_trait_database(TRAIT_DB_PATH)
+
+
+def get_trait_index(report):
+    """TF-IDF index over the report's traits, built once per report in this session."""
+    if st.session_state.get("trait_index_report") is not report:
+        lookup = get_trait_lookup(trait_db_version(TRAIT_DB_PATH))
+        st.session_state.trait_index = TraitIndex(report["traits"], lookup)
+        st.session_state.trait_index_report = report
+    return st.session_state.trait_index
+
+
+def get_chat_context(report):
+    """Chat history and conversation context for the current report; a new report starts a new chat."""
+    if st.session_state.get("chat_context_report") is not report:
+        st.session_state.chat_history = []
+        st.session_state.chat_context = ConversationContext()
+        st.session_state.chat_context_report = report
+    return st.session_state.chat_context
+
+# ---------- Report helpers ----------
+@st.cache_resource
+def get_report_store():
+    """One ReportStore per server process, shared by all sessions."""
+    return ReportStore()
+
+
+def show_overview(slot, ai_summary, pending=False):
+    """Fill the AI overview slot (or a pending notice while the model is still writing)."""
+    with slot.container():
+        st.markdown("### AI overview")
+        if pending:
+            st.info("Asking the model to summarize your traits...")
+        elif ai_summary:
+            st.write(ai_summary)
+        else:
+            st.write(
+                "The AI overview could not be generated, but the structured trait report is still available below."
+            )
+
+
+def show_text_report(slot, text_report):
+    with slot.container():
+        with st.expander("View technical text summary"):
+            st.text(text_report)
+
+
+def show_html_report(slot, html_report):
+    with slot.container():
+        st.markdown("### Detailed trait report")
+        st.components.v1.html(html_report, height=850, scrolling=True)
+
+
+def show_pdf_download(report, ai_summary):
+    st.download_button(
+        "Download PDF report",
+        data=render_pdf_report(report, ai_summary),
+        file_name="genetic_report.pdf",
+        mime="application/pdf",
+    )
+
+
+def show_email_note(email_for_result):
+    if email_for_result.strip():
+        st.info(
+            f"In a future deployed version, this report could also be sent securely to {email_for_result.strip()} "
+            "from a GenAI Engine email address."
+        )
+
+
+def render_report_outputs(report, ai_summary, text_report, html_report, email_for_result=""):
+    """Render a finished report (AI overview, text summary, HTML and PDF download) on the Upload page."""
+    show_overview(st.empty(), ai_summary)
+    show_text_report(st.empty(), text_report)
+    show_html_report(st.empty(), html_report)
+    show_pdf_download(report, ai_summary)
+    show_email_note(email_for_result)
+
 # ---------- HOME ----------
 if page == "Home":
     st.markdown(
@@ -1274,54 +1360,111 @@ elif page == "Upload & Report":
         generate = st.button("Run analysis")
 
         if generate:
-            trait_lookup = load_trait_database(TRAIT_DB_PATH)
-
             if uploaded and not use_demo:
-                temp_path = "uploaded_genome.txt"
-                with open(temp_path, "wb") as f:
-                    f.write(uploaded.getvalue())
-                genotype_path = temp_path
+                # Parsed straight from memory: no temp file shared between sessions
+                genome_bytes = uploaded.getvalue()
             else:
-                genotype_path = "test_genotype.txt"
+                with open("test_genotype.txt", "rb") as f:
+                    genome_bytes = f.read()
 
-            try:
-                variants = parse_genotype_file(genotype_path)
-                matched_traits = match_traits(trait_lookup, variants)
-                report = build_report_object(matched_traits)
+            # A new analysis must not show the previous upload's plan
+            st.session_state.pop("lifestyle_plan", None)
 
-                # Save for chatbot
-                st.session_state.last_report = report
+            try:
+                store = get_report_store()
+                # cache_version() also tags the backend, so stub replies are never served as saved reports
+                store_key = (genome_hash(genome_bytes), cache_version())
+                stored = store.get(*store_key)
 
-                if not matched_traits:
-                    st.warning("No traits were matched. Check that the file uses the expected rsIDs and genotypes.")
-                else:
-                    with st.spinner("Asking the model to summarize your traits..."):
-                        ai_summary = generate_ai_summary(report)
+                if stored is not None:
+                    report = stored["report"]
+                    ai_summary = stored["ai_summary"]
 
+                    # Save for chatbot
+                    st.session_state.last_report = report
                     st.session_state.last_ai_summary = ai_summary
+                    if stored["lifestyle_plan"]:
+                        st.session_state.lifestyle_plan = stored["lifestyle_plan"]
 
-                    st.markdown("### AI overview")
-                    if ai_summary:
-                        st.write(ai_summary)
-                    else:
-                        st.write(
-                            "The AI overview could not be generated, but the structured trait report is still available below."
+                    st.caption("Loaded your saved report for this file.")
+                    render_report_outputs(
+                        report, ai_summary, stored["text_report"], stored["html_report"], email_for_result
+                    )
+                else:
+                    # Structured renders show up as soon as they are ready;
+                    # the AI overview is slotted in above them when it arrives.
+                    overview_slot = st.empty()
+                    text_slot = st.empty()
+                    html_slot = st.empty()
+
+                    streamed = []
+
+                    def on_report(report):
+                        # Save for chatbot
+                        st.session_state.last_report = report
+                        if report["traits"]:
+                            show_overview(overview_slot, None, pending=True)
+                        else:
+                            overview_slot.warning(
+                                "No traits were matched. Check that the file uses the expected rsIDs and genotypes."
+                            )
+
+                    def on_summary_chunk(chunk):
+                        # Render tokens as they arrive
+                        streamed.append(chunk)
+                        show_overview(overview_slot, "".join(streamed))
+
+                    def on_renders(text_report, html_report):
+                        if not st.session_state.last_report["traits"]:
+                            return
+                        show_text_report(text_slot, text_report)
+                        show_html_report(html_slot, html_report)
+
+                    def on_plan(lifestyle_plan):
+                        # Ready for the Lifestyle Chatbot page
+                        st.session_state.lifestyle_plan = lifestyle_plan
+
+                    def on_summary(ai_summary, html_report):
+                        st.session_state.last_ai_summary = ai_summary
+                        show_overview(overview_slot, ai_summary)
+                        if ai_summary:
+                            show_html_report(html_slot, html_report)
+
+                    result = asyncio.run(
+                        run_report_pipeline(
+                            genome_bytes,
+                            on_report=on_report,
+                            on_renders=on_renders,
+                            on_summary=on_summary,
+                            on_summary_chunk=on_summary_chunk,
+                            with_plan=True,
+                            on_plan=on_plan,
                         )
+                    )
 
-                    text_report = generate_text_report(report)
-
-                    with st.expander("View technical text summary"):
-                        st.text(text_report)
-
-                    st.markdown("### Detailed trait report")
-                    html_report = generate_html_report(report, ai_summary=ai_summary)
-                    st.components.v1.html(html_report, height=850, scrolling=True)
+                    if result["ai_error"] is not None:
+                        st.warning(
+                            f"The AI overview could not be generated. {friendly_error_message(result['ai_error'])}"
+                        )
+                    elif result["ai_summary"]:
+                        store.put(
+                            *store_key,
+                            result["report"],
+                            ai_summary=result["ai_summary"],
+                            text_report=result["text_report"],
+                            html_report=result["html_report"],
+                            lifestyle_plan=result["lifestyle_plan"],
+                        )
 
-                    if email_for_result.strip():
-                        st.info(
-                            f"In a future deployed version, this report could also be sent securely to {email_for_result.strip()} "
-                            "from a GenAI Engine email address."
+                    if result["plan_error"] is not None:
+                        st.warning(
+                            "The lifestyle plan could not be generated. "
+                            f"{friendly_error_message(result['plan_error'])} "
+                            "You can try again from the Lifestyle Chatbot page."
                         )
+                    if result["report"]["traits"]:
+                        show_pdf_download(result["report"], result["ai_summary"])
+                        show_email_note(email_for_result)
 
             except Exception as e:
                 st.error(f"Something went wrong while generating the report: {e}")
@@ -1398,34 +1541,14 @@ elif page == "Lifestyle Chatbot":
     else:
         # Optionally generate a structured lifestyle overview plan
         if generate_plan_clicked:
-            lifestyle_context = f"Trait JSON:\n{report}\n\nAI summary of traits:\n{ai_summary or ''}"
-            lifestyle_system = (
-                "You are a careful genetics-informed lifestyle coach. "
-                "Given a structured trait report and an AI summary, create a short, non-medical lifestyle plan. "
-                "Organize the plan into sections such as Sleep, Focus & Learning, Movement & Recovery, Caffeine & Stimulants, "
-                "and Everyday Habits. For each section, list 3-5 gentle, practical ideas that could be helpful for someone with these traits. "
-                "Use tentative language (may, might, could) and remind the reader that this is not medical advice."
-            )
-
             try:
-                plan_resp = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": lifestyle_system},
-                        {"role": "user", "content": lifestyle_context},
-                    ],
-                    temperature=0.6,
-                )
-                lifestyle_plan = plan_resp.choices[0].message.content.strip()
-                st.session_state["lifestyle_plan"] = lifestyle_plan
-
                 with st.expander("View your current lifestyle plan", expanded=True):
-                    st.markdown(lifestyle_plan)
+                    lifestyle_plan = st.write_stream(generate_lifestyle_plan_stream(report, ai_summary))
+                st.session_state["lifestyle_plan"] = lifestyle_plan.strip()
             except Exception as e:
-                st.error(f"There was an error generating the lifestyle plan: {e}")
+                st.warning(f"The lifestyle plan could not be generated. {friendly_error_message(e)}")
 
-        if "chat_history" not in st.session_state:
-            st.session_state.chat_history = []
+        chat_context = get_chat_context(report)
 
         # Show previous messages
         for role, content in st.session_state.chat_history:
@@ -1440,31 +1563,36 @@ elif page == "Lifestyle Chatbot":
 
             system_prompt = (
                 "You are a genetics informed lifestyle coach. "
-                "You receive a JSON report of traits and a short AI summary. "
+                "You receive the user's traits most relevant to their question. "
                 "You may discuss possible lifestyle ideas related to sleep, focus, caffeine, training, and general wellness. "
                 "You must avoid medical advice, diagnosis, or treatment recommendations. "
                 "Use careful language like may, might, and could, and encourage the user to talk with a clinician "
                 "or genetic counselor for any medical questions."
             )
 
-            context_snippet = f"Trait JSON:\n{report}\n\nSummary:\n{ai_summary or ''}"
+            # Only the traits relevant to this question (and the previous one, for follow-ups)
+            previous_questions = [c for r, c in st.session_state.chat_history[:-1] if r == "user"][-1:]
+            context_snippet = get_trait_index(report).context(
+                " ".join(previous_questions + [user_input]), token_budget=CHAT_CONTEXT_TOKEN_BUDGET
+            )
 
             with st.chat_message("assistant"):
                 try:
-                    resp = client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": context_snippet},
-                            {"role": "user", "content": user_input},
-                        ],
-                        temperature=0.7,
-                    )
-                    reply = resp.choices[0].message.content.strip()
+                    reply = st.write_stream(
+                        stream_chat_completion(
+                            chat_context.messages(system_prompt, context_snippet, user_input),
+                            temperature=0.7,
+                            priority=PRIORITY_CHAT,
+                            purpose="chat",
+                        )
+                    ).strip()
                 except Exception as e:
-                    reply = f"There was an error calling the model: {e}"
+                    reply = friendly_error_message(e)
+                    st.markdown(reply)
+                else:
+                    chat_context.add_turn("user", user_input)
+                    chat_context.add_turn("assistant", reply)
 
-                st.markdown(reply)
                 st.session_state.chat_history.append(("assistant", reply))
 
  # ---------- TRAIT EXPLORER ----------
@@ -1546,6 +1674,8 @@ elif page == "Trait Explorer":
                         "trait_name": row.get("trait_name"),
                         "genotype": row.get("genotype"),
                         "variant_effect": row.get("effect_label"),
+                        "effect_level": row.get("effect_level"),
+                        "effect_score": resolve_effect_score(row.get("effect_score"), row.get("effect_level")),
                         "evidence_level": row.get("evidence_strength"),
                         "explanation": row.get("explanation"),
                         "mechanism": row.get("mechanism") or "",
@@ -0,0 +1,390 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from genomics_interpreter import (
+    LLM_MODEL,
+    TRAIT_DB_PATH,
+    _ai_summary_messages,
+    build_report_object,
+    cache_version,
+    chat_completion,
+    get_summary_cache,
+    iter_html_report,
+    iter_text_report,
+    load_trait_database,
+    match_traits,
+    parse_genotype_file,
+    summary_cache_version,
+    trait_db_version,
+)
+from llm_backends import get_backend
+from pdf_report import render_pdf_report
+from report_export import open_writer
+from summary_cache import trait_fingerprint, trait_set
+
+# A batch job lives in its own directory:
+#   state.json      progress, provider batch/file ids (rewritten atomically)
+#   samples.jsonl   one line per sample: sample_id, fingerprint, report
+#   requests.jsonl  one chat request per distinct trait set (Batch API format)
+#   retry.jsonl     the requests still unanswered when a batch is resubmitted
+#   output.jsonl    provider output, or the local stand-in's output
+#   results.jsonl   summaries joined back to every sample
+# Re-running a job picks up from whatever state.json says was done last.
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+DEFAULT_POLL_SECONDS = 30
+LOCAL_MAX_WORKERS = 8
+
+TERMINAL_BATCH_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# Provider batches submitted per run before unanswered requests are given up on
+MAX_BATCH_ATTEMPTS = 3
+
+
+def _iter_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _read_jsonl(path):
+    return list(_iter_jsonl(path))
+
+
+def _succeeded(row):
+    return row is not None and (row.get("response") or {}).get("status_code") == 200
+
+
+def _write_jsonl(path, rows):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+class BatchJob:
+    """Cohort AI summaries as a resumable batch job rooted at `job_dir`."""
+
+    def __init__(self, job_dir):
+        self.dir = Path(job_dir)
+        self.state_path = self.dir / "state.json"
+        self.samples_path = self.dir / "samples.jsonl"
+        self.requests_path = self.dir / "requests.jsonl"
+        self.retry_path = self.dir / "retry.jsonl"
+        self.output_path = self.dir / "output.jsonl"
+        self.results_path = self.dir / "results.jsonl"
+        self.state = {}
+        if self.state_path.exists():
+            with open(self.state_path, encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    @property
+    def status(self):
+        return self.state.get("status", "new")
+
+    def save_state(self, **updates):
+        self.state.update(updates, updated_at=time.time())
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    def prepare(self, genotype_paths, trait_db_path=TRAIT_DB_PATH):
+        """
+        Build a report per genotype file and write one summary request per
+        distinct trait set (samples with the same traits share a request).
+        """
+        trait_lookup = load_trait_database(trait_db_path)
+        db_version = trait_db_version(trait_db_path)
+        samples = []
+        requests = {}
+        for path in genotype_paths:
+            report = build_report_object(match_traits(trait_lookup, parse_genotype_file(path)), db_version)
+            fingerprint = trait_fingerprint(trait_set(report))
+            samples.append({"sample_id": Path(path).stem, "fingerprint": fingerprint, "report": report})
+            if report["traits"] and fingerprint not in requests:
+                requests[fingerprint] = {
+                    "custom_id": fingerprint,
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": {
+                        "model": LLM_MODEL,
+                        "messages": _ai_summary_messages(report),
+                        "temperature": 0.7,
+                    },
+                }
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        _write_jsonl(self.samples_path, samples)
+        _write_jsonl(self.requests_path, requests.values())
+        self.save_state(
+            status="prepared",
+            num_samples=len(samples),
+            num_requests=len(requests),
+            cache_version=cache_version(),
+            created_at=time.time(),
+        )
+
+    def pending_requests(self):
+        """Requests with no successful answer in output.jsonl yet."""
+        done = set()
+        if self.output_path.exists():
+            done = {row["custom_id"] for row in _read_jsonl(self.output_path) if _succeeded(row)}
+        return [r for r in _read_jsonl(self.requests_path) if r["custom_id"] not in done]
+
+    def submit(self, local=False):
+        """Submit every request that has no successful answer yet."""
+        mode = "local" if local or get_backend().name != "openai" else "openai"
+        if mode == "local":
+            self.save_state(status="submitted", mode=mode)
+            return
+
+        pending = self.pending_requests()
+        if not pending:
+            self.save_state(status="completed", mode=mode)
+            return
+        requests_path = self.requests_path
+        if len(pending) < self.state["num_requests"]:
+            requests_path = self.retry_path
+            _write_jsonl(requests_path, pending)
+
+        client = get_backend().client
+        input_file_id = self.state.get("input_file_id")
+        if input_file_id is None:
+            with open(requests_path, "rb") as f:
+                input_file_id = client.files.create(file=f, purpose="batch").id
+            # Saved before creating the batch so a retry after a crash reuses the upload
+            self.save_state(input_file_id=input_file_id)
+        batch = client.batches.create(
+            input_file_id=input_file_id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW,
+        )
+        self.save_state(
+            status="submitted",
+            mode=mode,
+            batch_id=batch.id,
+            attempts=self.state.get("attempts", 0) + 1,
+        )
+
+    def poll(self):
+        """Advance a submitted job; returns True once provider output is complete."""
+        if self.state["mode"] == "local":
+            self._run_local()
+            self.save_state(status="completed")
+            return True
+
+        client = get_backend().client
+        batch = client.batches.retrieve(self.state["batch_id"])
+        self.save_state(batch_status=batch.status, request_counts=_counts(batch))
+        if batch.status not in TERMINAL_BATCH_STATUSES:
+            return False
+
+        # Expired and cancelled batches still carry the requests they finished
+        if batch.output_file_id:
+            self._merge_output(client.files.content(batch.output_file_id).text)
+            self.save_state(output_file_id=batch.output_file_id)
+        pending = self.pending_requests()
+        if not pending:
+            self.save_state(status="completed")
+            return True
+
+        attempts = self.state.get("attempts", 1)
+        if attempts < MAX_BATCH_ATTEMPTS:
+            # A new upload holding only the unanswered requests
+            self.save_state(status="retrying", input_file_id=None)
+            self.submit()
+            return False
+        if batch.status == "completed":
+            # Requests that keep failing are reported per sample by join()
+            self.save_state(status="completed")
+            return True
+        self.save_state(status="failed")
+        raise RuntimeError(
+            f"Batch {batch.id} ended with status {batch.status}; {len(pending)} requests "
+            f"still have no answer after {attempts} attempts. Re-run the job to retry them."
+        )
+
+    def _merge_output(self, text):
+        """Add provider output to output.jsonl, keeping earlier successes over new failures."""
+        rows = {}
+        if self.output_path.exists():
+            rows = {row["custom_id"]: row for row in _read_jsonl(self.output_path)}
+        for line in text.splitlines():
+            if line.strip():
+                row = json.loads(line)
+                if not _succeeded(rows.get(row["custom_id"])):
+                    rows[row["custom_id"]] = row
+        _write_jsonl(self.output_path, rows.values())
+
+    def _run_local(self):
+        """Local stand-in for the Batch API: answers pending requests, appending as it goes."""
+        # Failed requests are retried on resume; successes are kept
+        pending = self.pending_requests()
+
+        def answer(request):
+            body = request["body"]
+            try:
+                content = chat_completion(
+                    body["messages"], body["model"], body["temperature"], purpose="batch"
+                )
+                return {
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {"choices": [{"message": {"role": "assistant", "content": content}}]},
+                    },
+                    "error": None,
+                }
+            except Exception as e:
+                return {"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}}
+
+        with ThreadPoolExecutor(max_workers=LOCAL_MAX_WORKERS) as pool, \
+                open(self.output_path, "a", encoding="utf-8") as out:
+            for row in pool.map(answer, pending):
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                out.flush()
+
+    def join(self):
+        """Join summaries back to every sample and warm the trait-set summary cache."""
+        summaries = {}
+        errors = {}
+        for row in _read_jsonl(self.output_path):
+            response = row.get("response") or {}
+            if response.get("status_code") == 200:
+                content = response["body"]["choices"][0]["message"]["content"]
+                summaries[row["custom_id"]] = content.strip()
+            else:
+                errors[row["custom_id"]] = (row.get("error") or {}).get("message") or "request failed"
+        for custom_id in summaries:
+            # A local run logs a failed attempt before the retry that answered it
+            errors.pop(custom_id, None)
+
+        summary_cache = get_summary_cache()
+        results = []
+        for sample in _read_jsonl(self.samples_path):
+            fingerprint = sample["fingerprint"]
+            summary = summaries.get(fingerprint)
+            if summary is not None:
+                # Batch requests are single-prompt summaries
+                version = summary_cache_version(sample["report"], "single", self.state["cache_version"])
+                summary_cache.put(sample["report"], version, summary)
+            error = None
+            if summary is None and sample["report"]["traits"]:
+                error = errors.get(fingerprint, "no output for this request")
+            results.append(
+                {
+                    "sample_id": sample["sample_id"],
+                    "report": sample["report"],
+                    "ai_summary": summary,
+                    "error": error,
+                }
+            )
+
+        _write_jsonl(self.results_path, results)
+        self.save_state(status="joined", num_summaries=len(summaries), num_errors=len(errors))
+        return results
+
+    def render(self, out_dir):
+        """
+        Write each joined sample's text, HTML and PDF report to `out_dir`, one
+        sample at a time, so memory stays flat however large the cohort is.
+        """
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        count = 0
+        for result in _iter_jsonl(self.results_path):
+            stem = out_dir / result["sample_id"]
+            with open(stem.with_suffix(".txt"), "w", encoding="utf-8") as f:
+                f.writelines(iter_text_report(result["report"]))
+            with open(stem.with_suffix(".html"), "w", encoding="utf-8") as f:
+                f.writelines(iter_html_report(result["report"], result["ai_summary"]))
+            with open(stem.with_suffix(".pdf"), "wb") as f:
+                f.write(render_pdf_report(result["report"], result["ai_summary"]))
+            count += 1
+        return count
+
+    def export(self, path, mode="w"):
+        """
+        Export joined results as one row per (sample, trait) to `path`
+        (.jsonl, .csv or .parquet), streaming samples and writing in batches.
+        The file is replaced, so re-running a job re-exports the same rows;
+        pass `mode="a"` to add them to an existing file instead.
+        """
+        with open_writer(path, mode=mode) as writer:
+            for result in _iter_jsonl(self.results_path):
+                writer.write_report(result["sample_id"], result["report"])
+        return writer.rows_written
+
+    def run(self, genotype_paths=None, local=False, poll_seconds=DEFAULT_POLL_SECONDS):
+        """Drive the job to completion, resuming from the saved state."""
+        if self.status == "new":
+            if not genotype_paths:
+                raise ValueError("A new batch job needs genotype files")
+            self.prepare(genotype_paths)
+        if self.status == "failed":
+            print(f"Batch job {self.dir} failed last time; resubmitting the requests with no answer")
+            self.save_state(status="retrying", input_file_id=None, attempts=0)
+        if self.status in ("prepared", "retrying"):
+            self.submit(local=local)
+        while self.status == "submitted":
+            if not self.poll():
+                time.sleep(poll_seconds)
+        if self.status == "completed":
+            self.join()
+        return _read_jsonl(self.results_path)
+
+
+def _counts(batch):
+    counts = getattr(batch, "request_counts", None)
+    if counts is None:
+        return None
+    return {"total": counts.total, "completed": counts.completed, "failed": counts.failed}
+
+
+def genotype_files(inputs):
+    """Expand directories into the .txt genotype files they contain."""
+    paths = []
+    for item in inputs:
+        p = Path(item)
+        paths.extend(sorted(p.glob("*.txt")) if p.is_dir() else [p])
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cohort AI summaries as a resumable batch job")
+    parser.add_argument("job_dir", help="directory holding the job's files and state")
+    parser.add_argument("genotypes", nargs="*", help="genotype files or directories (new jobs only)")
+    parser.add_argument("--local", action="store_true", help="use the local stand-in instead of the Batch API")
+    parser.add_argument("--poll-seconds", type=float, default=DEFAULT_POLL_SECONDS)
+    parser.add_argument("--render-dir", help="also write each sample's text, HTML and PDF report here")
+    parser.add_argument(
+        "--export",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help="also export one row per (sample, trait) to a .jsonl, .csv or .parquet file (repeatable)",
+    )
+    args = parser.parse_args()
+
+    job = BatchJob(args.job_dir)
+    results = job.run(genotype_files(args.genotypes), local=args.local, poll_seconds=args.poll_seconds)
+    failed = sum(1 for r in results if r["error"])
+    print(f"{len(results)} samples, {job.state.get('num_requests', 0)} requests, {failed} failed")
+    print(f"Results written to {job.results_path}")
+    if args.render_dir:
+        print(f"{job.render(args.render_dir)} reports rendered to {args.render_dir}")
+    for path in args.export:
+        print(f"{job.export(path)} rows exported to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from genomics_interpreter import (
+    GENOTYPE_FILE_PATH,
+    LLM_MODEL,
+    TRAIT_DB_PATH,
+    _ai_summary_messages,
+    build_report_object,
+    category_groups,
+    generate_html_report,
+    generate_text_report,
+    get_fragment_cache,
+    load_trait_database,
+    match_traits,
+    parse_genotype_file,
+    trait_db_version,
+)
+from lazy_html_report import generate_lazy_html_report
+
+
+def demo_report():
+    trait_lookup = load_trait_database(TRAIT_DB_PATH)
+    variants = parse_genotype_file(GENOTYPE_FILE_PATH)
+    return build_report_object(match_traits(trait_lookup, variants), trait_db_version(TRAIT_DB_PATH))
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def bench_llm(args):
+    """Offline throughput of the model-call path against the deterministic stub backend."""
+    from llm_backends import StubBackend, set_backend
+    from llm_client import complete_chat, stream_chat
+    from rate_limiter import RateLimiter, set_rate_limiter
+
+    set_backend(StubBackend(latency=args.latency, tokens_per_second=args.tps, reply_tokens=args.reply_tokens))
+    set_rate_limiter(RateLimiter(requests_per_minute=args.rpm, tokens_per_minute=args.tpm))
+    messages = _ai_summary_messages(demo_report())
+
+    def one(i):
+        # A distinct request per call so nothing is served from a cache
+        request = messages + [{"role": "user", "content": f"request {i}"}]
+        start = time.perf_counter()
+        if args.stream:
+            chunks = stream_chat(request, LLM_MODEL, 0.7)
+            first = None
+            for _ in chunks:
+                if first is None:
+                    first = time.perf_counter() - start
+            return first, time.perf_counter() - start
+        complete_chat(request, LLM_MODEL, 0.7)
+        return None, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - start
+
+    latencies = [total for _, total in results]
+    print(f"requests={args.requests} concurrency={args.concurrency} stream={args.stream}")
+    print(f"throughput: {args.requests / wall:.1f} req/s over {wall:.2f}s")
+    print(
+        f"latency ms: p50={percentile(latencies, 50) * 1000:.0f} "
+        f"p95={percentile(latencies, 95) * 1000:.0f} p99={percentile(latencies, 99) * 1000:.0f} "
+        f"mean={statistics.mean(latencies) * 1000:.0f}"
+    )
+    if args.stream:
+        ttft = [first for first, _ in results if first is not None]
+        print(f"time to first token ms: p50={percentile(ttft, 50) * 1000:.0f} p95={percentile(ttft, 95) * 1000:.0f}")
+
+
+def bench_render(args):
+    """Report rendering time, per report and per trait."""
+    from pdf_report import render_pdf_report
+
+    report = demo_report()
+    report = build_report_object(report["traits"] * args.scale, report["db_version"])
+    n_traits = len(report["traits"])
+    summary = "An overview paragraph.\n" * 5
+
+    renderers = [
+        ("html", lambda: generate_html_report(report, summary)),
+        ("html-lazy", lambda: generate_lazy_html_report(report, summary)),
+        ("text", lambda: generate_text_report(report)),
+        ("pdf", lambda: render_pdf_report(report, summary)),
+    ]
+    print(f"traits={n_traits} iterations={args.iterations}")
+    for name, render in renderers:
+        output = render()  # warm-up
+        size = len(output) if isinstance(output, bytes) else len(output.encode("utf-8"))
+        times = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            render()
+            times.append(time.perf_counter() - start)
+        p50 = percentile(times, 50)
+        print(
+            f"{name}: p50={p50 * 1000:.3f} ms/report  {p50 / n_traits * 1e6:.2f} us/trait  "
+            f"{size / 1024:.1f} KiB"
+        )
+    print(f"fragment cache: {get_fragment_cache().stats()}")
+
+
+def _time(fn, iterations):
+    fn()  # warm-up
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return percentile(times, 50)
+
+
+def bench_index(args):
+    """Cost of building the category index, and of reading groups from it versus regrouping."""
+    traits = demo_report()["traits"] * args.scale
+    report = build_report_object(traits)
+
+    def regroup():
+        groups = {}
+        for t in report["traits"]:
+            groups.setdefault(t["category"], []).append(t)
+        return groups
+
+    print(f"traits={len(traits)} categories={len(report['category_index'])} iterations={args.iterations}")
+    for name, fn in [
+        ("build_report_object", lambda: build_report_object(traits)),
+        ("category_groups", lambda: category_groups(report)),
+        ("regroup (before)", regroup),
+    ]:
+        p50 = _time(fn, args.iterations)
+        print(f"{name}: p50={p50 * 1000:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GenAI Engine benchmarks (run offline)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    llm = sub.add_parser("llm", help="model-call throughput against the stub backend")
+    llm.add_argument("--requests", type=int, default=200)
+    llm.add_argument("--concurrency", type=int, default=16)
+    llm.add_argument("--latency", type=float, default=0.2, help="stub seconds to first token")
+    llm.add_argument("--tps", type=float, default=200.0, help="stub tokens per second")
+    llm.add_argument("--reply-tokens", type=int, default=120)
+    llm.add_argument("--stream", action="store_true")
+    llm.add_argument("--rpm", type=int, default=0, help="rate limit, requests per minute (0 = off)")
+    llm.add_argument("--tpm", type=int, default=0, help="rate limit, tokens per minute (0 = off)")
+    llm.set_defaults(func=bench_llm)
+
+    render = sub.add_parser("render", help="HTML, text and PDF report rendering time")
+    render.add_argument("--scale", type=int, default=1, help="repeat the demo traits this many times")
+    render.add_argument("--iterations", type=int, default=200)
+    render.set_defaults(func=bench_render)
+
+    index = sub.add_parser("index", help="category index build and lookup time")
+    index.add_argument("--scale", type=int, default=1000, help="repeat the demo traits this many times")
+    index.add_argument("--iterations", type=int, default=50)
+    index.set_defaults(func=bench_index)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+from prompt_encoding import CHARS_PER_TOKEN, count_tokens, first_sentence
+from rate_limiter import PRIORITY_CHAT
+
+WINDOW_TOKEN_BUDGET = 800
+SUMMARY_TOKEN_BUDGET = 250
+
+# Once the window overflows it is compacted down to this fraction of its
+# budget, so the summary call runs every few turns rather than every turn
+FOLD_TO_FRACTION = 0.5
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a user and a genetics-informed "
+    "lifestyle coach. Given the current summary and some older turns that are about to be dropped, "
+    "return an updated summary in plain sentences. Keep the user's questions, stated goals, habits "
+    "and any suggestions already given. Do not add new advice. Stay under {words} words."
+)
+
+
+def summarize_turns(previous_summary, turns, token_budget=SUMMARY_TOKEN_BUDGET):
+    """Fold `turns` into `previous_summary` with a short model call."""
+    # Imported here so this module stays importable without an API client
+    from genomics_interpreter import chat_completion
+
+    transcript = "\n".join(f"{role}: {content}" for role, content in turns)
+    return chat_completion(
+        [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT.format(words=int(token_budget * 0.7))},
+            {
+                "role": "user",
+                "content": f"Current summary:\n{previous_summary or '(none)'}\n\nOlder turns:\n{transcript}",
+            },
+        ],
+        temperature=0.2,
+        # Runs inside the chat turn, so it must not queue behind background work
+        priority=PRIORITY_CHAT,
+        purpose="chat_summary",
+    )
+
+
+def _extractive_summary(previous_summary, turns):
+    """Fallback when the summary call fails: keep the first sentence of each turn."""
+    lines = [previous_summary] if previous_summary else []
+    lines.extend(f"{role}: {first_sentence(content)}" for role, content in turns)
+    return "\n".join(lines)
+
+
+class ConversationContext:
+    """Bounded chat context: recent turns plus a running summary of older ones.
+
+    The most recent turns are kept verbatim while they fit `window_tokens`.
+    Turns pushed out of the window are folded into `summary`, which is
+    updated incrementally and capped at `summary_tokens`, so the prompt
+    built by `messages()` stays the same size however long the chat runs.
+
+    Folding is a blocking model call made by `add_turn`. To keep that off
+    most turns, an overflowing window is cut back to `fold_to_fraction` of
+    its budget in one go, so older turns are summarized in blocks.
+    """
+
+    def __init__(self, window_tokens=WINDOW_TOKEN_BUDGET, summary_tokens=SUMMARY_TOKEN_BUDGET,
+                 summarizer=summarize_turns, fold_to_fraction=FOLD_TO_FRACTION):
+        self.window_tokens = window_tokens
+        self.summary_tokens = summary_tokens
+        self.fold_to_fraction = fold_to_fraction
+        self.summarizer = summarizer
+        self.window = []
+        self.summary = ""
+
+    def _window_size(self):
+        return sum(count_tokens(content) for _, content in self.window)
+
+    def add_turn(self, role, content):
+        """Append a ("user" | "assistant", text) turn and compact the window if needed."""
+        self.window.append((role, content))
+
+        if self._window_size() <= self.window_tokens:
+            return
+        evicted = []
+        while self.window and self._window_size() > self.window_tokens * self.fold_to_fraction:
+            evicted.append(self.window.pop(0))
+        self._fold(evicted)
+
+    def _fold(self, turns):
+        try:
+            summary = self.summarizer(self.summary, turns, self.summary_tokens)
+        except Exception as e:
+            print("Conversation summary failed, keeping an extractive summary instead:", e)
+            summary = _extractive_summary(self.summary, turns)
+
+        if count_tokens(summary) > self.summary_tokens:
+            # Hard cap: keep the most recent part of an over-long summary
+            summary = summary[-self.summary_tokens * CHARS_PER_TOKEN:]
+        self.summary = summary.strip()
+
+    def messages(self, system_prompt, context, user_input):
+        """Chat messages for the next turn: system, report context, summary, window, question."""
+        msgs = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": context},
+        ]
+        if self.summary:
+            msgs.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        msgs.extend({"role": role, "content": content} for role, content in self.window)
+        msgs.append({"role": "user", "content": user_input})
+        return msgs
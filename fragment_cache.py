@@ -0,0 +1,49 @@
+import threading
+
+DEFAULT_MAX_ENTRIES = 20_000
+
+
+class FragmentCache:
+    """In-memory cache of rendered report fragments (trait cards, text blocks).
+
+    A fragment depends only on the trait row and the user's genotype, so
+    callers key it on (kind, trait_id, rsid, genotype, trait DB version)
+    and popular fragments are rendered once per process instead of once
+    per report. At most `max_entries` fragments are kept; the oldest are
+    evicted first.
+
+    Lookups are a plain dict read with no lock or reordering: a cached
+    card is cheaper to render than an LRU update would cost, so only
+    inserts take the lock.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render, arg):
+        """Return the cached fragment for `key`, rendering it with `render(arg)` on a miss."""
+        fragment = self._entries.get(key)
+        if fragment is None:
+            # A concurrent miss just renders the same fragment twice
+            fragment = render(arg)
+            self._put(key, fragment)
+        return fragment
+
+    def _put(self, key, fragment):
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = fragment
+            while len(self._entries) > self.max_entries:
+                # Dicts keep insertion order, so this is the oldest entry
+                del self._entries[next(iter(self._entries))]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"misses": self.misses, "entries": len(self._entries)}
@@ -1,83 +1,518 @@
+import asyncio
 import csv
+import hashlib
 import json
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from openai import OpenAI
-client = OpenAI()
+from fragment_cache import FragmentCache
+from llm_backends import get_backend
+from llm_cache import LLMCache, cache_key
+from llm_client import complete_chat, stream_chat
+from llm_metrics import track_call
+from prompt_encoding import count_message_tokens, count_tokens, encode_report
+from rate_limiter import PRIORITY_BACKGROUND, PRIORITY_OVERVIEW, PRIORITY_PLAN
+from singleflight import Abandoned, SingleFlight
+from summary_cache import SummaryCache
 
-def generate_ai_summary(report):
+LLM_MODEL = "gpt-4o-mini"
+
+# Token budgets for the report context sent with each prompt
+SUMMARY_PROMPT_TOKEN_BUDGET = 1200
+CHAT_CONTEXT_TOKEN_BUDGET = 600
+
+_llm_cache = None
+_summary_cache = None
+_fragment_cache = None
+# The cache getters run on worker threads too: creation is locked, while the
+# unlocked check in front keeps an existing cache's lookup a plain read
+_caches_lock = threading.Lock()
+
+# Identical model requests in flight at the same time share one call
+inflight = SingleFlight()
+
+
+def get_llm_cache():
+    """Process-wide LLM response cache (created on first use)."""
+    global _llm_cache
+    if _llm_cache is None:
+        with _caches_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMCache()
+    return _llm_cache
+
+
+def get_summary_cache():
+    """Process-wide trait-set fingerprint cache of AI summaries (created on first use)."""
+    global _summary_cache
+    if _summary_cache is None:
+        with _caches_lock:
+            if _summary_cache is None:
+                _summary_cache = SummaryCache()
+    return _summary_cache
+
+
+def get_fragment_cache():
+    """Process-wide cache of rendered trait cards and text blocks (created on first use)."""
+    global _fragment_cache
+    if _fragment_cache is None:
+        with _caches_lock:
+            if _fragment_cache is None:
+                _fragment_cache = FragmentCache()
+    return _fragment_cache
+
+
+def _cached_fragment(kind, render, t, db_version):
     """
-    Use the OpenAI API to generate a friendly, non-medical summary
-    of the person's genetic trait results.
+    Rendered fragment of one trait, cached under the trait DB version the
+    report was built against. Reports without a version (saved before it
+    was recorded) are rendered uncached, so they never fill the cache with
+    content from an unknown database.
+    """
+    if db_version is None:
+        return render(t)
+    key = (kind, t["trait_id"], t["rsid"], t["user_genotype"], db_version)
+    return get_fragment_cache().get_or_render(key, render, t)
+
+
+def cache_version():
+    """
+    Version tag for cached model output: the trait DB version, qualified
+    with the backend name for anything but the real API so stub replies
+    never leak into (or out of) the real caches.
+    """
+    backend = get_backend()
+    if backend.name == "openai":
+        return trait_db_version()
+    return f"{trait_db_version()}+{backend.name}"
+
+
+def chat_completion(messages, model=LLM_MODEL, temperature=0.7, priority=PRIORITY_BACKGROUND,
+                    purpose="other"):
+    """
+    Send a chat request to the model and return the stripped reply text.
+    Byte-identical requests against the same trait database are served
+    from the on-disk response cache, and identical requests already in
+    flight (another session, a double click) share that call's result.
+    `priority` orders the call against others waiting for rate-limit
+    capacity (see rate_limiter). Every call is recorded in the metrics
+    sink under `purpose` (see llm_metrics).
     """
+    cache = get_llm_cache()
+    key = cache_key(model, temperature, messages, cache_version())
+    with track_call(purpose, model, get_backend().name) as call:
+        cached = cache.get(key)
+        if cached is not None:
+            call.cache = "hit"
+            return cached
 
-    report_json = json.dumps(report, indent=2)
+        def fetch():
+            call.cache = "miss"
+            usage = {}
+            reply = complete_chat(messages, model, temperature, priority=priority, usage=usage).strip()
+            _record_usage(call, messages, reply, usage)
+            cache.put(key, reply)
+            return reply
+
+        # Stays "coalesced" unless this caller ends up making the request itself
+        call.cache = "coalesced"
+        return inflight.do(key, fetch)
+
+
+def stream_chat_completion(messages, model=LLM_MODEL, temperature=0.7, priority=PRIORITY_BACKGROUND,
+                           purpose="other"):
+    """
+    Streaming variant of `chat_completion`: yields reply text chunks as the
+    model produces them. A cache hit is yielded as a single chunk; a fully
+    streamed reply is stored in the cache once it completes. If the same
+    request is already in flight, its full reply is awaited and yielded
+    as a single chunk instead of making a second call.
+    """
+    cache = get_llm_cache()
+    key = cache_key(model, temperature, messages, cache_version())
+    with track_call(purpose, model, get_backend().name) as call:
+        cached = cache.get(key)
+        if cached is not None:
+            call.cache = "hit"
+            call.first_token()
+            yield cached
+            return
+
+        flight, leader = inflight.begin(key)
+        if not leader:
+            call.cache = "coalesced"
+            try:
+                reply = flight.wait()
+            except Abandoned:
+                call.error = "Abandoned"
+                yield from stream_chat_completion(messages, model, temperature, priority, purpose)
+                return
+            call.first_token()
+            yield reply
+            return
+
+        parts = []
+        usage = {}
+        try:
+            for delta in stream_chat(messages, model, temperature, priority=priority, usage=usage):
+                if not parts:
+                    # Match the stripped output of chat_completion
+                    delta = delta.lstrip()
+                    if not delta:
+                        continue
+                    call.first_token()
+                parts.append(delta)
+                yield delta
+        except BaseException as e:
+            # Includes GeneratorExit when the consumer stops early
+            inflight.end(key, flight, error=e if isinstance(e, Exception) else Abandoned("Stream was closed early"))
+            raise
+
+        reply = "".join(parts).strip()
+        _record_usage(call, messages, reply, usage)
+        cache.put(key, reply)
+        inflight.end(key, flight, result=reply)
+
+
+def _record_usage(call, messages, reply, usage):
+    """Fill token counts from the API's usage, estimating any the backend did not report."""
+    call.prompt_tokens = usage.get("prompt_tokens") or count_message_tokens(messages)
+    call.completion_tokens = usage.get("completion_tokens") or count_tokens(reply)
+
+
+SUMMARY_RULES = (
+    "Important rules:\n"
+    "- Do NOT give medical advice.\n"
+    "- Do NOT diagnose or suggest treatments.\n"
+    "- Do NOT mention specific SNP IDs or genotypes; focus on the meaning.\n"
+    "- Keep the tone warm, encouraging, and non-alarming.\n"
+    "- Write in clear paragraphs, no markdown symbols like ** or bullet points.\n"
+)
+
+# Reports with at least this many traits are summarized per category in parallel
+MAP_REDUCE_MIN_TRAITS = 30
+CATEGORY_PROMPT_TOKEN_BUDGET = 500
+SUMMARY_MAX_WORKERS = 8
+
+REMEMBER_SECTION = (
+    "Genetics is only one factor in how you feel, eat, sleep and move. Your environment, daily habits, "
+    "mental health and medical care matter a lot, and these results are a starting point for curiosity, "
+    "not a prediction. If anything here raises questions about your health, a doctor or genetic counselor "
+    "is the right person to talk to."
+)
+
+
+def _ai_summary_messages(report):
+    """Chat messages for the AI overview of a report."""
+    report_text = encode_report(report, token_budget=SUMMARY_PROMPT_TOKEN_BUDGET)
 
     system_message = (
         "You are a friendly, supportive genetics educator writing for a teenager or adult "
-        "with no formal genetics background. You are given structured genetic trait data in JSON.\n\n"
+        "with no formal genetics background. You are given a compact list of genetic trait results, "
+        "grouped by category.\n\n"
         "Your job:\n"
         "1. Start with a short 'Big Picture' overview (1–2 short paragraphs) summarizing overall themes.\n"
-        "2. Then write a 'Highlights by Category' section. For any categories that appear in the JSON "
+        "2. Then write a 'Highlights by Category' section. For any categories that appear in the data "
         "(e.g., Nutrition, Fitness, Sleep, Neurobehavior, Sensory, Appearance), briefly describe 1–3 key points "
         "in simple language. This should still be in paragraph form, not bullet points.\n"
         "3. End with a 'Remember' section emphasizing that genetics is only one factor and that environment, "
         "lifestyle, mental health, and medical care matter a lot.\n\n"
-        "Important rules:\n"
-        "- Do NOT give medical advice.\n"
-        "- Do NOT diagnose or suggest treatments.\n"
-        "- Do NOT mention specific SNP IDs or genotypes; focus on the meaning.\n"
-        "- Keep the tone warm, encouraging, and non-alarming.\n"
-        "- Write in clear paragraphs, no markdown symbols like ** or bullet points.\n"
+        + SUMMARY_RULES
     )
 
     user_message = (
-        "Here is the JSON report describing this person's interpreted genetic traits:\n\n"
-        f"{report_json}\n\n"
+        "Here is the report describing this person's interpreted genetic traits:\n\n"
+        f"{report_text}\n\n"
         "Please follow the instructions in the system message and write the summary accordingly."
     )
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message},
-        ],
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message},
+    ]
+
+
+def _category_highlight_messages(category, traits):
+    """Chat messages for the 'Highlights by Category' paragraph of one category."""
+    report_text = encode_report(build_report_object(traits), token_budget=CATEGORY_PROMPT_TOKEN_BUDGET)
+
+    system_message = (
+        "You are a friendly, supportive genetics educator writing for a teenager or adult "
+        "with no formal genetics background. You are given genetic trait results from one category.\n\n"
+        f"Write one short paragraph (2–4 sentences) describing the 1–3 most useful points for the "
+        f"{category} category in simple language. Do not add a heading.\n\n"
+        + SUMMARY_RULES
+    )
+
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": report_text},
+    ]
+
+
+def _big_picture_messages(highlights):
+    """Chat messages for the final 'Big Picture' call over the per-category highlights."""
+    highlights_text = "\n\n".join(f"{category}: {text}" for category, text in highlights)
+
+    system_message = (
+        "You are a friendly, supportive genetics educator writing for a teenager or adult "
+        "with no formal genetics background. You are given short highlights of someone's genetic "
+        "trait results, one paragraph per category.\n\n"
+        "Write a 'Big Picture' overview of 1–2 short paragraphs summarizing the overall themes "
+        "across categories. Do not repeat every detail and do not add a heading.\n\n"
+        + SUMMARY_RULES
+    )
+
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": highlights_text},
+    ]
+
+
+def _category_highlight(category, traits):
+    return chat_completion(
+        _category_highlight_messages(category, traits),
+        temperature=0.7,
+        priority=PRIORITY_OVERVIEW,
+        purpose="overview_category",
+    )
+
+
+def _category_highlights(report):
+    """Generate the per-category highlight paragraphs in parallel, in category order."""
+    traits_by_cat = dict(category_groups(report))
+    categories = sorted(traits_by_cat)
+
+    with ThreadPoolExecutor(max_workers=SUMMARY_MAX_WORKERS) as pool:
+        highlights = pool.map(lambda category: _category_highlight(category, traits_by_cat[category]), categories)
+        return list(zip(categories, highlights))
+
+
+def _iter_category_highlights(report):
+    """Yield (category, highlight) pairs as the parallel highlight calls finish, fastest first."""
+    traits_by_cat = dict(category_groups(report))
+    pool = ThreadPoolExecutor(max_workers=SUMMARY_MAX_WORKERS)
+    try:
+        futures = {
+            pool.submit(_category_highlight, category, traits_by_cat[category]): category
+            for category in sorted(traits_by_cat)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # On an error or an abandoned stream, don't start the calls still queued
+        pool.shutdown(cancel_futures=True)
+
+
+def _format_highlights(highlights):
+    """The 'Highlights by Category' and 'Remember' sections of a map-reduce summary."""
+    sections = ["Highlights by Category"]
+    sections.extend(f"{category}: {text}" for category, text in highlights)
+    sections.extend(["Remember", REMEMBER_SECTION])
+    return "\n\n".join(sections)
+
+
+def generate_ai_summary_map_reduce(report):
+    """
+    Map-reduce variant of `generate_ai_summary` for large reports.
+
+    Each category slice of the report gets its own 'Highlights by Category'
+    call, all issued in parallel; a short final call writes the 'Big
+    Picture' from those highlights. Wall-clock time is roughly two model
+    round trips no matter how many traits the panel has.
+    """
+    highlights = _category_highlights(report)
+    big_picture = chat_completion(
+        _big_picture_messages(highlights), temperature=0.7, priority=PRIORITY_OVERVIEW, purpose="overview_big_picture"
+    )
+    return f"Big Picture\n\n{big_picture}\n\n{_format_highlights(highlights)}"
+
+
+def use_map_reduce(report, mode="auto"):
+    if mode == "auto":
+        return report["summary"]["num_traits_found"] >= MAP_REDUCE_MIN_TRAITS
+    return mode == "map_reduce"
+
+
+def summary_cache_version(report, mode="auto", version=None):
+    """
+    Summary cache tag: `version` (cache_version() by default) plus the
+    resolved summary mode, so single-prompt and map-reduce summaries of the
+    same trait set are cached separately.
+    """
+    if version is None:
+        version = cache_version()
+    return f"{version}+{'map_reduce' if use_map_reduce(report, mode) else 'single'}"
+
+
+def generate_ai_summary(report, mode="auto"):
+    """
+    Use the OpenAI API to generate a friendly, non-medical summary
+    of the person's genetic trait results.
+
+    `mode` is "single" (one prompt), "map_reduce" (per-category fan-out,
+    see `generate_ai_summary_map_reduce`) or "auto", which picks map-reduce
+    for reports with at least MAP_REDUCE_MIN_TRAITS traits.
+
+    Summaries are shared across reports with the same (or a near-identical)
+    matched trait set through the trait-set fingerprint cache.
+    """
+    summary_cache = get_summary_cache()
+    db_version = summary_cache_version(report, mode)
+    cached = summary_cache.get(report, db_version)
+    if cached is not None:
+        return cached[0]
+
+    if use_map_reduce(report, mode):
+        summary = generate_ai_summary_map_reduce(report)
+    else:
+        summary = chat_completion(
+            _ai_summary_messages(report), temperature=0.7, priority=PRIORITY_OVERVIEW, purpose="overview"
+        )
+    summary_cache.put(report, db_version, summary)
+    return summary
+
+
+def _map_reduce_summary_chunks(report):
+    highlights = []
+    yield "Highlights by Category"
+    for category, text in _iter_category_highlights(report):
+        highlights.append((category, text))
+        yield f"\n\n{category}: {text}"
+    yield "\n\nBig Picture\n\n"
+    yield from stream_chat_completion(
+        _big_picture_messages(highlights),
         temperature=0.7,
+        priority=PRIORITY_OVERVIEW,
+        purpose="overview_big_picture",
     )
+    yield f"\n\nRemember\n\n{REMEMBER_SECTION}"
+
+
+def generate_ai_summary_stream(report, mode="auto"):
+    """
+    Streaming variant of `generate_ai_summary`: yields summary text chunks
+    as they arrive so callers can render tokens immediately.
+
+    In map-reduce mode the sections come in a different order from
+    `generate_ai_summary`: 'Highlights by Category' first, each category's
+    paragraph yielded as soon as its call finishes (fastest first, so the
+    first text arrives after one short call), then the Big Picture streamed
+    token by token over those highlights, then Remember. A trait-set
+    fingerprint cache hit is yielded as a single chunk.
+    """
+    summary_cache = get_summary_cache()
+    db_version = summary_cache_version(report, mode)
+    cached = summary_cache.get(report, db_version)
+    if cached is not None:
+        yield cached[0]
+        return
+
+    parts = []
+    if use_map_reduce(report, mode):
+        chunks = _map_reduce_summary_chunks(report)
+    else:
+        chunks = stream_chat_completion(
+            _ai_summary_messages(report), temperature=0.7, priority=PRIORITY_OVERVIEW, purpose="overview"
+        )
+
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    summary_cache.put(report, db_version, "".join(parts).strip())
 
-    return response.choices[0].message.content.strip()
+
+def _lifestyle_plan_messages(report, ai_summary=None):
+    """Chat messages for the lifestyle plan; the AI summary is optional context."""
+    lifestyle_context = f"Trait report:\n{encode_report(report, token_budget=CHAT_CONTEXT_TOKEN_BUDGET)}"
+    if ai_summary:
+        lifestyle_context += f"\n\nAI summary of traits:\n{ai_summary}"
+
+    lifestyle_system = (
+        "You are a careful genetics-informed lifestyle coach. "
+        "Given a structured trait report (and an AI summary, when provided), create a short, non-medical lifestyle plan. "
+        "Organize the plan into sections such as Sleep, Focus & Learning, Movement & Recovery, Caffeine & Stimulants, "
+        "and Everyday Habits. For each section, list 3-5 gentle, practical ideas that could be helpful for someone with these traits. "
+        "Use tentative language (may, might, could) and remind the reader that this is not medical advice."
+    )
+
+    return [
+        {"role": "system", "content": lifestyle_system},
+        {"role": "user", "content": lifestyle_context},
+    ]
+
+
+def generate_lifestyle_plan(report, ai_summary=None):
+    """
+    Generate a short, non-medical lifestyle plan for a report. Only the
+    report is required, so this can run concurrently with the AI summary.
+    """
+    return chat_completion(
+        _lifestyle_plan_messages(report, ai_summary), temperature=0.6, priority=PRIORITY_PLAN, purpose="plan"
+    )
+
+
+def generate_lifestyle_plan_stream(report, ai_summary=None):
+    """Streaming variant of `generate_lifestyle_plan`."""
+    yield from stream_chat_completion(
+        _lifestyle_plan_messages(report, ai_summary), temperature=0.6, priority=PRIORITY_PLAN, purpose="plan"
+    )
 
 TRAIT_DB_PATH = "trait_database.csv"
 TRAIT_DB_JSON_PATH = "trait_database_model.json"
 GENOTYPE_FILE_PATH = "test_genotype.txt"
 
 
-def generate_text_report(report):
-    lines = []
-    lines.append("AI-READY GENETIC TRAIT SUMMARY")
-    lines.append("=" * 40)
-    lines.append(f"Number of traits interpreted: {report['summary']['num_traits_found']}")
-    lines.append("Categories: " + ", ".join(report["summary"]["categories"]))
-    lines.append("")
-
-    # Group traits by category
-    traits_by_cat = {}
-    for t in report["traits"]:
-        traits_by_cat.setdefault(t["category"], []).append(t)
-
-    for category, traits in traits_by_cat.items():
-        lines.append(f"\n## {category}")
-        lines.append("-" * (4 + len(category)))
+def _join_lines(parts):
+    """Lazy "\\n".join: yields `parts` with a newline before every part but the first."""
+    parts = iter(parts)
+    for first in parts:
+        yield first
+        break
+    for part in parts:
+        yield "\n" + part
+
+
+def render_text_block(t):
+    """Plain-text block for one trait."""
+    return "\n".join(
+        [
+            f"\nTrait: {t['trait_name']}",
+            f"Gene: {t['gene']} ({t['rsid']}) — Genotype: {t['user_genotype']}",
+            f"Effect: {t['effect_label']}  [{t['effect_level']}]",
+            f"Explanation: {t['explanation']}",
+            f"Evidence: {t['evidence_strength']}",
+            "",
+        ]
+    )
 
+
+def _text_report_parts(report):
+    yield "AI-READY GENETIC TRAIT SUMMARY"
+    yield "=" * 40
+    yield f"Number of traits interpreted: {report['summary']['num_traits_found']}"
+    yield "Categories: " + ", ".join(report["summary"]["categories"])
+    yield ""
+
+    db_version = report.get("db_version")
+    for category, traits in category_groups(report):
+        yield f"\n## {category}"
+        yield "-" * (4 + len(category))
         for t in traits:
-            lines.append(f"\nTrait: {t['trait_name']}")
-            lines.append(f"Gene: {t['gene']} ({t['rsid']}) — Genotype: {t['user_genotype']}")
-            lines.append(f"Effect: {t['effect_label']}  [{t['effect_level']}]")
-            lines.append(f"Explanation: {t['explanation']}")
-            lines.append(f"Evidence: {t['evidence_strength']}")
-            lines.append("")
+            yield _cached_fragment("text", render_text_block, t, db_version)
+
 
-    return "\n".join(lines)
+def iter_text_report(report):
+    """
+    Yield the text report in chunks (one per trait) for writing straight to
+    a file or response, e.g. `f.writelines(iter_text_report(report))`.
+    """
+    return _join_lines(_text_report_parts(report))
+
+
+def generate_text_report(report):
+    return "\n".join(_text_report_parts(report))
 
 
 def load_trait_database(csv_path):
@@ -88,7 +523,9 @@ def load_trait_database(csv_path):
 
     Returns:
         dict keyed by (rsid, genotype) -> row dict with fields matching the
-        original CSV shape used by `match_traits`.
+        original CSV shape used by `match_traits`, plus a numeric
+        `effect_score` (explicit column if present, else derived from
+        `effect_level`).
     """
     lookup = {}
 
@@ -116,6 +553,7 @@ def load_trait_database(csv_path):
                 "explanation": tr.get("explanation", ""),
                 "evidence_strength": tr.get("evidence_level", ""),
             }
+            row["effect_score"] = resolve_effect_score(tr.get("effect_score"), row["effect_level"])
             key = (rsid, genotype)
             lookup[key] = row
 
@@ -134,6 +572,7 @@ def load_trait_database(csv_path):
             for row in reader:
                 rsid = row["rsid"].strip()
                 genotype = row["genotype"].strip().upper()
+                row["effect_score"] = resolve_effect_score(row.get("effect_score"), row["effect_level"])
                 key = (rsid, genotype)
                 lookup[key] = row
     except Exception as e:
@@ -142,33 +581,70 @@ def load_trait_database(csv_path):
     return lookup
 
 
-def parse_genotype_file(path):
+def trait_db_version(csv_path=TRAIT_DB_PATH):
+    """Short content hash identifying the trait database currently in use.
+
+    Covers both the JSON model and the legacy CSV, so editing either one
+    invalidates anything persisted against the previous version.
+    """
+    h = hashlib.sha256()
+    for path in (TRAIT_DB_JSON_PATH, csv_path):
+        try:
+            with open(path, "rb") as f:
+                h.update(path.encode("utf-8"))
+                h.update(f.read())
+        except FileNotFoundError:
+            continue
+    return h.hexdigest()[:16]
+
+
+def _genotype_lines(source):
+    """Text lines of a genotype source (path, bytes-like or file-like)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        # str() decodes straight from the buffer, no intermediate bytes copy
+        return str(source, "utf-8").splitlines()
+    if hasattr(source, "read"):
+        return (line.decode("utf-8") if isinstance(line, bytes) else line for line in source)
+    return None
+
+
+def parse_genotype_file(source):
     """
     Parse a 23andMe-style file.
+    `source` is a path, the raw file contents (bytes, bytearray or
+    memoryview, e.g. an upload's getvalue()) or an open text/binary file,
+    so uploads never need to touch the disk.
     Returns list of dicts: {rsid, genotype, chromosome, position}
     """
+    lines = _genotype_lines(source)
+    if lines is None:
+        with open(source, encoding="utf-8") as f:
+            return _parse_genotype_lines(f)
+    return _parse_genotype_lines(lines)
+
+
+def _parse_genotype_lines(lines):
     variants = []
-    with open(path, encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            parts = line.split()
-            # Expect: rsid  chromosome  position  genotype
-            if parts[0].lower() == "rsid":
-                # header line
-                continue
-            if len(parts) < 4:
-                continue
-            rsid, chrom, pos, genotype = parts[0], parts[1], parts[2], parts[3]
-            variants.append(
-                {
-                    "rsid": rsid,
-                    "chromosome": chrom,
-                    "position": pos,
-                    "genotype": genotype.upper(),
-                }
-            )
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split()
+        # Expect: rsid  chromosome  position  genotype
+        if parts[0].lower() == "rsid":
+            # header line
+            continue
+        if len(parts) < 4:
+            continue
+        rsid, chrom, pos, genotype = parts[0], parts[1], parts[2], parts[3]
+        variants.append(
+            {
+                "rsid": rsid,
+                "chromosome": chrom,
+                "position": pos,
+                "genotype": genotype.upper(),
+            }
+        )
     return variants
 
 
@@ -192,6 +668,7 @@ def match_traits(trait_lookup, variants):
                 "user_genotype": var["genotype"],
                 "effect_label": row["effect_label"],
                 "effect_level": row["effect_level"],
+                "effect_score": row["effect_score"],
                 "explanation": row["explanation"],
                 "evidence_strength": row["evidence_strength"],
             }
@@ -200,20 +677,60 @@ def match_traits(trait_lookup, variants):
     return matched_traits
 
 
-def build_report_object(matched_traits):
+def build_report_object(matched_traits, db_version=None):
     """
     Build a JSON-like object summarizing everything.
     This is what you'd send into an AI model prompt.
+    `db_version` is the trait_db_version the traits were matched against;
+    it is kept in the report and keys the report's cached fragments.
+
+    Traits are stored grouped by category (categories in order of first
+    appearance, traits in file order within each). `category_index` gives
+    each category's slice of `traits` and its evidence histogram, and the
+    summary carries per-category and overall counts, so consumers read
+    the groups with `category_groups` instead of regrouping.
     """
+    groups = {}
+    for t in matched_traits:
+        groups.setdefault(t["category"], []).append(t)
+
+    traits = []
+    category_index = []
+    evidence_counts = Counter()
+    for category, group in groups.items():
+        evidence = Counter(t["evidence_strength"] for t in group)
+        evidence_counts.update(evidence)
+        category_index.append(
+            {"category": category, "start": len(traits), "stop": len(traits) + len(group), "evidence": dict(evidence)}
+        )
+        traits.extend(group)
+
     report = {
         "summary": {
-            "num_traits_found": len(matched_traits),
-            "categories": sorted({t["category"] for t in matched_traits}),
+            "num_traits_found": len(traits),
+            "categories": sorted(groups),
+            "category_counts": {category: len(groups[category]) for category in sorted(groups)},
+            "evidence_counts": dict(evidence_counts),
         },
-        "traits": matched_traits,
+        "traits": traits,
+        "category_index": category_index,
+        "db_version": db_version,
     }
     return report
 
+
+def category_groups(report):
+    """(category, traits) pairs in report order, read from the report's category index."""
+    index = report.get("category_index")
+    if index is None:
+        # Reports saved before the index existed
+        groups = {}
+        for t in report["traits"]:
+            groups.setdefault(t["category"], []).append(t)
+        return list(groups.items())
+    traits = report["traits"]
+    return [(entry["category"], traits[entry["start"]:entry["stop"]]) for entry in index]
+
 def effect_level_to_percent(effect_level: str) -> int:
     """
     Map effect_level strings to a rough percentage for the visual bar.
@@ -240,24 +757,45 @@ def effect_level_to_percent(effect_level: str) -> int:
         return 65
     if "DARK" in level:
         return 45
+    if "LOW" in level:
+        # Plain LOW / SLOW levels, as the old inline HTML mapping had them
+        return 30
 
     # Fallback
     return 50
 
-def generate_html_report(report, ai_summary=None):
-    # Simple icon per category
-    category_icons = {
-        "Nutrition": "🥦",
-        "Fitness": "🏃‍♀️",
-        "Sleep": "😴",
-        "Neurobehavior": "🧠",
-        "Sensory": "👁️",
-        "Appearance": "🌈",
-    }
 
-    html_parts = []
+def resolve_effect_score(effect_score, effect_level):
+    """
+    Numeric 0-100 bar score for a trait row: the explicit `effect_score`
+    column when it is set, otherwise derived from `effect_level`.
+    Resolved once when the trait database is loaded.
+    """
+    if effect_score not in (None, ""):
+        try:
+            return max(0, min(100, round(float(effect_score))))
+        except (TypeError, ValueError, OverflowError):
+            print(f"Invalid effect_score {effect_score!r}; deriving it from effect_level {effect_level!r}")
+    return effect_level_to_percent(effect_level or "")
+
+
+def trait_effect_score(t):
+    """Bar score of a matched trait (derived here only for reports saved before scores existed)."""
+    score = t.get("effect_score")
+    return score if score is not None else effect_level_to_percent(t["effect_level"])
+
+# Static parts of the HTML report, built once at import
+CATEGORY_ICONS = {
+    "Nutrition": "🥦",
+    "Fitness": "🏃‍♀️",
+    "Sleep": "😴",
+    "Neurobehavior": "🧠",
+    "Sensory": "👁️",
+    "Appearance": "🌈",
+}
+DEFAULT_CATEGORY_ICON = "🧬"
 
-    html_parts.append("""
+HTML_REPORT_HEAD = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -426,10 +964,55 @@ def generate_html_report(report, ai_summary=None):
 </head>
 <body>
 <div class="page">
-""")
+"""
+
+HTML_REPORT_FOOT = """
+<div class="disclaimer">
+    <strong>Important:</strong> This report is for educational and informational purposes only.
+    It does not provide medical advice, diagnosis, or treatment. Genetics is one factor among many including
+    environment, sleep, stress, and medical history. For any health related questions, talk with a licensed
+    healthcare provider or genetic counselor.
+</div>
+</div>
+</body>
+</html>
+"""
+
+CATEGORY_OPEN_TEMPLATE = (
+    '<div class="category" id="{safe_id}">\n'
+    '<h2><span class="category-icon">{icon}</span>{category}</h2>\n'
+    '<div class="trait-grid">'
+)
+CATEGORY_CLOSE = "</div>\n</div>"
+
+
+def render_trait_card(t):
+    """HTML card for one trait, built as a single f-string (no per-line list appends)."""
+    return (
+        '<div class="trait-card">\n'
+        f'<div class="trait-title">{t["trait_name"]}</div>\n'
+        f'<div class="meta">Gene: {t["gene"]} ({t["rsid"]}) · Genotype: {t["user_genotype"]}</div>\n'
+        '<div class="effect">'
+        f'<span class="effect-label">Effect:</span> {t["effect_label"]} '
+        f'<span class="effect-tag">{t["effect_level"]}</span>'
+        '</div>\n'
+        '<div class="bar-outer">\n'
+        f'<div class="bar-inner" style="width: {trait_effect_score(t)}%;"></div>\n'
+        '</div>\n'
+        f'<div class="explanation">{t["explanation"]}</div>\n'
+        f'<div class="evidence"><strong>Evidence level:</strong> {t["evidence_strength"]}</div>\n'
+        '</div>'
+    )
+
+
+def _category_anchor(category):
+    return f"cat-{category.replace(' ', '-')}"
 
-    html_parts.append("<h1>Genetic Trait Summary</h1>")
-    html_parts.append(
+
+def _html_header_parts(report, ai_summary=None):
+    """Title, contents and AI overview, shared by the full and lazy HTML reports."""
+    yield "<h1>Genetic Trait Summary</h1>"
+    yield (
         f"<div class='header-sub'>Traits interpreted: "
         f"<strong>{report['summary']['num_traits_found']}</strong> "
         f"&nbsp;·&nbsp; Categories: {', '.join(report['summary']['categories'])}</div>"
@@ -437,126 +1020,221 @@ def generate_html_report(report, ai_summary=None):
 
     categories = report["summary"]["categories"]
     if categories:
-        html_parts.append("<div class='toc'>")
-        html_parts.append("<div class='toc-title'>Jump to a section</div>")
-        html_parts.append("<div class='toc-links'>")
+        yield "<div class='toc'>"
+        yield "<div class='toc-title'>Jump to a section</div>"
+        yield "<div class='toc-links'>"
         for cat in categories:
-            icon = category_icons.get(cat, "🧬")
-            safe_id = f"cat-{cat.replace(' ', '-')}"
-            html_parts.append(
-                f"<a onclick=\"scrollToSection('{safe_id}')\">{icon} {cat}</a>"
-            )
-        html_parts.append("</div></div>")
+            icon = CATEGORY_ICONS.get(cat, DEFAULT_CATEGORY_ICON)
+            yield f"<a onclick=\"scrollToSection('{_category_anchor(cat)}')\">{icon} {cat}</a>"
+        yield "</div></div>"
 
     if ai_summary:
         ai_html = ai_summary.replace("\n", "<br>")
-        html_parts.append("<div class='section-label'>Personalized overview</div>")
-        html_parts.append("<div class='overview-box'>")
-        html_parts.append(f"{ai_html}")
-        html_parts.append("</div>")
-
-    traits_by_cat = {}
-    for t in report["traits"]:
-        traits_by_cat.setdefault(t["category"], []).append(t)
-
-    for category, traits in traits_by_cat.items():
-        safe_id = f"cat-{category.replace(' ', '-')}"
-        icon = category_icons.get(category, "🧬")
-
-        html_parts.append(f'<div class="category" id="{safe_id}">')
-        html_parts.append(
-            f'<h2><span class="category-icon">{icon}</span>{category}</h2>'
-        )
-        html_parts.append('<div class="trait-grid">')
+        yield "<div class='section-label'>Personalized overview</div>"
+        yield "<div class='overview-box'>"
+        yield ai_html
+        yield "</div>"
+
+
+def _html_report_parts(report, ai_summary=None):
+    yield HTML_REPORT_HEAD
+    yield from _html_header_parts(report, ai_summary)
 
+    db_version = report.get("db_version")
+    for category, traits in category_groups(report):
+        yield CATEGORY_OPEN_TEMPLATE.format(
+            safe_id=_category_anchor(category),
+            icon=CATEGORY_ICONS.get(category, DEFAULT_CATEGORY_ICON),
+            category=category,
+        )
         for t in traits:
-            from math import floor
-            # crude mapping: use effect_level length as proxy if you have no numeric score
-            percent = 50
-            try:
-                level = str(t["effect_level"]).upper()
-                if "HIGH" in level and "LOW" not in level:
-                    percent = 80
-                elif "LOW" in level:
-                    percent = 30
-                elif "MEDIUM" in level or "INTERMEDIATE" in level or "TYPICAL" in level:
-                    percent = 55
-            except Exception:
-                percent = 50
-
-            html_parts.append('<div class="trait-card">')
-            html_parts.append(f'<div class="trait-title">{t["trait_name"]}</div>')
-            html_parts.append(
-                f'<div class="meta">Gene: {t["gene"]} ({t["rsid"]}) · Genotype: {t["user_genotype"]}</div>'
-            )
-            html_parts.append(
-                '<div class="effect">'
-                f'<span class="effect-label">Effect:</span> {t["effect_label"]} '
-                f'<span class="effect-tag">{t["effect_level"]}</span>'
-                '</div>'
-            )
-            html_parts.append('<div class="bar-outer">')
-            html_parts.append(f'<div class="bar-inner" style="width: {percent}%;"></div>')
-            html_parts.append('</div>')
-            html_parts.append(f'<div class="explanation">{t["explanation"]}</div>')
-            html_parts.append(
-                f'<div class="evidence"><strong>Evidence level:</strong> {t["evidence_strength"]}</div>'
-            )
-            html_parts.append("</div>")
-
-        html_parts.append("</div>")
-        html_parts.append("</div>")
-
-    html_parts.append("""
-<div class="disclaimer">
-    <strong>Important:</strong> This report is for educational and informational purposes only.
-    It does not provide medical advice, diagnosis, or treatment. Genetics is one factor among many including
-    environment, sleep, stress, and medical history. For any health related questions, talk with a licensed
-    healthcare provider or genetic counselor.
-</div>
-</div>
-</body>
-</html>
-""")
+            yield _cached_fragment("html", render_trait_card, t, db_version)
+        yield CATEGORY_CLOSE
 
-    return "\n".join(html_parts)
+    yield HTML_REPORT_FOOT
 
 
-def main():
-    trait_lookup = load_trait_database(TRAIT_DB_PATH)
-    variants = parse_genotype_file(GENOTYPE_FILE_PATH)
+def iter_html_report(report, ai_summary=None):
+    """
+    Yield the HTML report in chunks (one per trait card) for writing
+    straight to a file or response without building the whole page.
+    """
+    return _join_lines(_html_report_parts(report, ai_summary))
+
+
+def generate_html_report(report, ai_summary=None):
+    return "\n".join(_html_report_parts(report, ai_summary))
+
+
+# Reports with at least this many traits are embedded in the app as the lazy page
+LAZY_HTML_MIN_TRAITS = 200
+
+
+def generate_report_html(report, ai_summary=None, lazy_min_traits=LAZY_HTML_MIN_TRAITS):
+    """HTML for embedding in the app: the full report, or the lazy one for large panels."""
+    if len(report["traits"]) >= lazy_min_traits:
+        # Imported here: lazy_html_report builds on this module's HTML parts
+        from lazy_html_report import generate_lazy_html_report
+
+        return generate_lazy_html_report(report, ai_summary)
+    return generate_html_report(report, ai_summary)
+
+
+async def _stream_summary(report, on_chunk):
+    """Pump `generate_ai_summary_stream` from a worker thread, calling on_chunk on the loop."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+
+    def pump():
+        try:
+            for chunk in generate_ai_summary_stream(report):
+                loop.call_soon_threadsafe(queue.put_nowait, chunk)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    worker = asyncio.create_task(asyncio.to_thread(pump))
+    parts = []
+    while True:
+        chunk = await queue.get()
+        if chunk is done:
+            break
+        parts.append(chunk)
+        on_chunk(chunk)
+
+    # Re-raises anything the stream failed with
+    await worker
+    return "".join(parts).strip()
+
+
+async def run_report_pipeline(genotype_source, trait_db_path=TRAIT_DB_PATH,
+                              on_report=None, on_renders=None, on_summary=None,
+                              on_summary_chunk=None, with_plan=False, on_plan=None):
+    """
+    Run parse -> match -> AI summary + renders, overlapping the model call
+    with the structured renders. `genotype_source` is anything
+    parse_genotype_file accepts (a path or the uploaded bytes).
+
+    The AI summary request is started as soon as the report object exists.
+    Text and HTML renders run concurrently with it and are handed to
+    `on_renders(text_report, html_report)` right away; once the summary
+    arrives the HTML is re-rendered with the overview slotted in and passed
+    to `on_summary(ai_summary, html_report)`. Large reports get the lazy
+    HTML page (see generate_report_html). `on_report(report)` fires
+    after matching. If `on_summary_chunk` is given the summary is streamed
+    and each text chunk is passed to it as it arrives. With `with_plan` the
+    lifestyle plan is requested concurrently with the summary (it only
+    needs the report) and handed to `on_plan(lifestyle_plan)` as soon as it
+    is ready. Callbacks run on the event loop thread.
+
+    Returns a dict with report, ai_summary, ai_error, text_report,
+    html_report, lifestyle_plan and plan_error.
+    """
+    trait_lookup = await asyncio.to_thread(load_trait_database, trait_db_path)
+    db_version = await asyncio.to_thread(trait_db_version, trait_db_path)
+    variants = await asyncio.to_thread(parse_genotype_file, genotype_source)
     matched_traits = match_traits(trait_lookup, variants)
-    report = build_report_object(matched_traits)
+    report = build_report_object(matched_traits, db_version)
 
-    # JSON output
-    print("Matched traits:")
-    print(json.dumps(report, indent=2))
+    result = {
+        "report": report,
+        "ai_summary": None,
+        "ai_error": None,
+        "text_report": None,
+        "html_report": None,
+        "lifestyle_plan": None,
+        "plan_error": None,
+    }
+    if on_report:
+        on_report(report)
+
+    async def plan():
+        try:
+            result["lifestyle_plan"] = await asyncio.to_thread(generate_lifestyle_plan, report)
+        except Exception as e:
+            result["plan_error"] = e
+            return
+        if on_plan:
+            on_plan(result["lifestyle_plan"])
+
+    # Start the slow model calls first so they overlap with everything below
+    summary_task = None
+    plan_task = None
+    if matched_traits and on_summary_chunk:
+        summary_task = asyncio.create_task(_stream_summary(report, on_summary_chunk))
+    elif matched_traits:
+        summary_task = asyncio.create_task(asyncio.to_thread(generate_ai_summary, report))
+    if matched_traits and with_plan:
+        plan_task = asyncio.create_task(plan())
+
+    text_report, html_report = await asyncio.gather(
+        asyncio.to_thread(generate_text_report, report),
+        asyncio.to_thread(generate_report_html, report),
+    )
+    result["text_report"] = text_report
+    result["html_report"] = html_report
+    if on_renders:
+        on_renders(text_report, html_report)
+
+    if summary_task is None:
+        return result
 
-    # AI summary
     try:
-        ai_summary = generate_ai_summary(report)
-        print("\n\nAI Summary:\n")
-        print(ai_summary)
+        ai_summary = await summary_task
     except Exception as e:
-        print("AI generation failed:", e)
+        result["ai_error"] = e
         ai_summary = None
 
-    # Human-readable text report
-    text_report = generate_text_report(report)
-    print("\n\nHuman-readable report:\n")
-    print(text_report)
+    if ai_summary:
+        html_report = await asyncio.to_thread(generate_report_html, report, ai_summary)
+        result["ai_summary"] = ai_summary
+        result["html_report"] = html_report
+    if on_summary:
+        on_summary(ai_summary, html_report)
+
+    if plan_task is not None:
+        await plan_task
+
+    return result
+
+
+def main():
+    def show_report(report):
+        # JSON output
+        print("Matched traits:")
+        print(json.dumps(report, indent=2))
+
+    def show_renders(text_report, html_report):
+        # Human-readable text report (ready before the AI summary)
+        print("\n\nHuman-readable report:\n")
+        print(text_report)
+
+    def show_summary(ai_summary, html_report):
+        if ai_summary:
+            print("\n\nAI Summary:\n")
+            print(ai_summary)
+
+    result = asyncio.run(
+        run_report_pipeline(
+            GENOTYPE_FILE_PATH,
+            on_report=show_report,
+            on_renders=show_renders,
+            on_summary=show_summary,
+        )
+    )
+    if result["ai_error"] is not None:
+        print("AI generation failed:", result["ai_error"])
 
     # Save text version
     with open("genetic_report.txt", "w", encoding="utf-8") as f:
-        f.write(text_report)
+        f.writelines(iter_text_report(result["report"]))
 
     # Save HTML version (with AI overview if available)
-    html_report = generate_html_report(report, ai_summary=ai_summary)
     with open("genetic_report.html", "w", encoding="utf-8") as f:
-        f.write(html_report)
+        f.writelines(iter_html_report(result["report"], result["ai_summary"]))
 
     print("\nSaved genetic_report.txt and genetic_report.html")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
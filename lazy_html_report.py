@@ -0,0 +1,191 @@
+import json
+
+from genomics_interpreter import (
+    CATEGORY_ICONS,
+    DEFAULT_CATEGORY_ICON,
+    HTML_REPORT_FOOT,
+    HTML_REPORT_HEAD,
+    _cached_fragment,
+    _category_anchor,
+    _html_header_parts,
+    category_groups,
+    trait_effect_score,
+)
+
+# The HTML report for very large panels. It shares the full report's head,
+# header and styling (see genomics_interpreter), but ships trait cards as
+# JSON that the script below turns into cards in the browser on demand.
+# genomics_interpreter.generate_report_html picks this page once a report
+# reaches LAZY_HTML_MIN_TRAITS traits.
+
+LAZY_HTML_CSS = """
+        .category.lazy h2 {
+            cursor: pointer;
+            user-select: none;
+        }
+        .category.lazy h2::after {
+            content: "▸";
+            font-size: 0.8em;
+            color: #6b7280;
+        }
+        .category.lazy.open h2::after {
+            content: "▾";
+        }
+        .category.lazy .trait-grid {
+            display: none;
+        }
+        .category.lazy.open .trait-grid {
+            display: flex;
+        }
+        .category-count {
+            font-size: 0.7em;
+            font-weight: 500;
+            color: #6b7280;
+        }
+        .category.lazy .trait-card {
+            content-visibility: auto;
+            contain-intrinsic-size: auto 160px;
+        }
+"""
+
+# Renders cards from the JSON payload: a category's cards are built only
+# when it is expanded, CHUNK at a time as the end of the list scrolls into
+# view, and off-screen cards skip layout via content-visibility.
+LAZY_HTML_SCRIPT = """<script>
+(function () {
+  var data = JSON.parse(document.getElementById('report-data').textContent);
+  var CHUNK = 40;
+  var observer = 'IntersectionObserver' in window ? new IntersectionObserver(function (entries) {
+    entries.forEach(function (e) { if (e.isIntersecting) { e.target.more(); } });
+  }, { rootMargin: '800px' }) : null;
+
+  function div(cls, text) {
+    var el = document.createElement('div');
+    el.className = cls;
+    if (text !== undefined) { el.textContent = text; }
+    return el;
+  }
+
+  function card(t) {
+    // t = [name, gene, rsid, genotype, effect_label, effect_level, effect_score, explanation, evidence]
+    var c = div('trait-card');
+    c.appendChild(div('trait-title', t[0]));
+    c.appendChild(div('meta', 'Gene: ' + t[1] + ' (' + t[2] + ') · Genotype: ' + t[3]));
+    var effect = div('effect');
+    var label = document.createElement('span');
+    label.className = 'effect-label';
+    label.textContent = 'Effect:';
+    var tag = document.createElement('span');
+    tag.className = 'effect-tag';
+    tag.textContent = t[5];
+    effect.appendChild(label);
+    effect.appendChild(document.createTextNode(' ' + t[4] + ' '));
+    effect.appendChild(tag);
+    c.appendChild(effect);
+    var bar = div('bar-outer');
+    var inner = div('bar-inner');
+    inner.style.width = t[6] + '%';
+    bar.appendChild(inner);
+    c.appendChild(bar);
+    c.appendChild(div('explanation', t[7]));
+    var evidence = div('evidence');
+    var strong = document.createElement('strong');
+    strong.textContent = 'Evidence level:';
+    evidence.appendChild(strong);
+    evidence.appendChild(document.createTextNode(' ' + t[8]));
+    c.appendChild(evidence);
+    return c;
+  }
+
+  function expand(section) {
+    section.classList.add('open');
+    if (section.started) { return; }
+    section.started = true;
+    var traits = data[+section.dataset.index];
+    var grid = section.querySelector('.trait-grid');
+    var sentinel = div('lazy-sentinel');
+    var rendered = 0;
+    grid.appendChild(sentinel);
+    sentinel.more = function () {
+      var end = observer ? Math.min(rendered + CHUNK, traits.length) : traits.length;
+      var frag = document.createDocumentFragment();
+      for (; rendered < end; rendered++) { frag.appendChild(card(traits[rendered])); }
+      grid.insertBefore(frag, sentinel);
+      if (rendered >= traits.length) {
+        if (observer) { observer.unobserve(sentinel); }
+        sentinel.remove();
+      }
+    };
+    sentinel.more();
+    if (observer && rendered < traits.length) { observer.observe(sentinel); }
+  }
+
+  var sections = document.querySelectorAll('.category.lazy');
+  sections.forEach(function (section) {
+    section.querySelector('h2').addEventListener('click', function () {
+      if (section.classList.contains('open')) { section.classList.remove('open'); } else { expand(section); }
+    });
+  });
+  if (sections.length) { expand(sections[0]); }
+
+  var scrollTo = window.scrollToSection;
+  window.scrollToSection = function (id) {
+    var section = document.getElementById(id);
+    if (section) { expand(section); }
+    scrollTo(id);
+  };
+})();
+</script>"""
+
+LAZY_HTML_REPORT_HEAD = HTML_REPORT_HEAD.replace("    </style>", LAZY_HTML_CSS + "    </style>", 1)
+LAZY_HTML_REPORT_FOOT = HTML_REPORT_FOOT.replace("</body>", LAZY_HTML_SCRIPT + "\n</body>", 1)
+
+
+def _lazy_row(t):
+    row = [
+        t["trait_name"],
+        t["gene"],
+        t["rsid"],
+        t["user_genotype"],
+        t["effect_label"],
+        t["effect_level"],
+        trait_effect_score(t),
+        t["explanation"],
+        t["evidence_strength"],
+    ]
+    # "</" would end the <script> element early
+    return json.dumps(row, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+
+
+def _lazy_payload(groups, db_version):
+    """JSON array of categories, each an array of trait rows (cached per trait like the cards)."""
+    categories = (
+        "[" + ",".join(_cached_fragment("json", _lazy_row, t, db_version) for t in traits) + "]"
+        for _, traits in groups
+    )
+    return "[" + ",".join(categories) + "]"
+
+
+def generate_lazy_html_report(report, ai_summary=None):
+    """
+    HTML report for very large panels: the header, contents and overview
+    are rendered here, but trait cards travel as a compact JSON payload
+    and are built in the browser only for expanded categories, a chunk at
+    a time as the reader scrolls.
+    """
+    parts = [LAZY_HTML_REPORT_HEAD]
+    parts.extend(_html_header_parts(report, ai_summary))
+
+    groups = category_groups(report)
+    for index, (category, traits) in enumerate(groups):
+        parts.append(
+            f'<div class="category lazy" id="{_category_anchor(category)}" data-index="{index}">\n'
+            f'<h2><span class="category-icon">{CATEGORY_ICONS.get(category, DEFAULT_CATEGORY_ICON)}</span>'
+            f'{category} <span class="category-count">{len(traits)} traits</span></h2>\n'
+            '<div class="trait-grid"></div>\n'
+            "</div>"
+        )
+    payload = _lazy_payload(groups, report.get("db_version"))
+    parts.append(f'<script type="application/json" id="report-data">{payload}</script>')
+    parts.append(LAZY_HTML_REPORT_FOOT)
+    return "\n".join(parts)
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from openai import OpenAI
+
+from prompt_encoding import count_message_tokens
+
+# Select the backend with GENAI_LLM_BACKEND=openai (default) or stub. The
+# stub is configured with GENAI_STUB_LATENCY (seconds to first token),
+# GENAI_STUB_TOKENS_PER_SECOND and GENAI_STUB_REPLY_TOKENS.
+
+STUB_VOCABULARY = (
+    "your traits may suggest a gentle tendency toward steady energy across the day and "
+    "genetics is only one part of the picture while sleep habits movement food and stress "
+    "all shape how you feel so these results are best read as friendly hints rather than rules"
+).split()
+
+
+class OpenAIBackend:
+    """Chat completions via the OpenAI API, on one lazily created shared client.
+
+    `complete` / `stream` fill the optional `usage` dict with prompt_tokens
+    and completion_tokens as reported by the API (for streams, once the
+    stream is exhausted).
+    """
+
+    name = "openai"
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                # The SDK's own retries are disabled; llm_client owns the retry policy
+                self._client = OpenAI(max_retries=0)
+            return self._client
+
+    def complete(self, messages, model, temperature, timeout, usage=None):
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            timeout=timeout,
+        )
+        if usage is not None and response.usage is not None:
+            usage["prompt_tokens"] = response.usage.prompt_tokens
+            usage["completion_tokens"] = response.usage.completion_tokens
+        return response.choices[0].message.content
+
+    def stream(self, messages, model, temperature, timeout, usage=None):
+        # The request is sent here (not lazily) so connection errors surface to the caller's retries
+        events = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            timeout=timeout,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+        def generate():
+            for event in events:
+                if usage is not None and getattr(event, "usage", None) is not None:
+                    # Sent on the final chunk, which carries no choices
+                    usage["prompt_tokens"] = event.usage.prompt_tokens
+                    usage["completion_tokens"] = event.usage.completion_tokens
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+
+        return generate()
+
+
+class StubBackend:
+    """Deterministic offline backend for load tests and benchmarks.
+
+    Replies are pseudo-random words seeded by the request, so the same
+    request always gets the same reply. Each call waits `latency` seconds
+    before the first token and then produces `tokens_per_second` tokens
+    per second, for `reply_tokens` tokens.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=0.3, tokens_per_second=60.0, reply_tokens=120):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+
+    def _tokens(self, messages, model, temperature):
+        seed = hashlib.sha256(
+            json.dumps([model, temperature, messages], sort_keys=True).encode("utf-8")
+        ).digest()
+        rng = random.Random(seed)
+        words = [rng.choice(STUB_VOCABULARY) for _ in range(self.reply_tokens)]
+        words[0] = words[0].capitalize()
+        return [words[0]] + [" " + w for w in words[1:]] + ["."]
+
+    def _usage(self, messages, tokens, usage):
+        if usage is not None:
+            usage["prompt_tokens"] = count_message_tokens(messages)
+            usage["completion_tokens"] = len(tokens)
+
+    def complete(self, messages, model, temperature, timeout, usage=None):
+        tokens = self._tokens(messages, model, temperature)
+        self._usage(messages, tokens, usage)
+        duration = self.latency + len(tokens) / self.tokens_per_second
+        if duration > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("Stub backend exceeded the request timeout")
+        time.sleep(duration)
+        return "".join(tokens)
+
+    def stream(self, messages, model, temperature, timeout, usage=None):
+        tokens = self._tokens(messages, model, temperature)
+        self._usage(messages, tokens, usage)
+
+        def generate():
+            time.sleep(self.latency)
+            for token in tokens:
+                time.sleep(1 / self.tokens_per_second)
+                yield token
+
+        return generate()
+
+
+def backend_from_env():
+    kind = os.environ.get("GENAI_LLM_BACKEND", "openai").lower()
+    if kind == "stub":
+        return StubBackend(
+            latency=float(os.environ.get("GENAI_STUB_LATENCY", 0.3)),
+            tokens_per_second=float(os.environ.get("GENAI_STUB_TOKENS_PER_SECOND", 60.0)),
+            reply_tokens=int(os.environ.get("GENAI_STUB_REPLY_TOKENS", 120)),
+        )
+    if kind == "openai":
+        return OpenAIBackend()
+    raise ValueError(f"Unknown GENAI_LLM_BACKEND: {kind!r} (expected 'openai' or 'stub')")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The process-wide backend (chosen from the environment on first use)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = backend_from_env()
+        return _backend
+
+
+def set_backend(backend):
+    """Swap the process-wide backend, e.g. for a StubBackend in benchmarks."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
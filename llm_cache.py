@@ -0,0 +1,127 @@
+import hashlib
+import json
+import threading
+import time
+
+from sqlite_conn import connect
+
+LLM_CACHE_PATH = "llm_cache.sqlite3"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def cache_key(model, temperature, messages, db_version):
+    """Stable key for a chat request: model, temperature, messages and trait DB version."""
+    payload = json.dumps(
+        {
+            "model": model,
+            "temperature": temperature,
+            "messages": messages,
+            "db_version": db_version,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """On-disk cache of model responses with TTL and size-bounded LRU eviction.
+
+    Entries older than `ttl_seconds` are treated as misses and removed.
+    When the stored responses exceed `max_bytes`, the least recently used
+    entries are evicted first. `hits` / `misses` count lookups made through
+    this instance.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with connect(self.path) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """Return the cached response text for `key`, or None on a miss."""
+        now = time.time()
+        with connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+
+        self._count(row is not None)
+        return row[0] if row is not None else None
+
+    def put(self, key, response):
+        """Store `response` under `key` and evict LRU entries beyond max_bytes."""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        to_free = total - self.max_bytes
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall():
+            if to_free <= 0:
+                break
+            stale.append((key,))
+            to_free -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def clear(self):
+        with connect(self.path) as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        """Hit/miss counters plus current on-disk entry count and size."""
+        with connect(self.path) as conn:
+            entries, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
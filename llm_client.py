@@ -0,0 +1,211 @@
+import random
+import threading
+import time
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+
+from llm_backends import get_backend
+from prompt_encoding import count_message_tokens
+from rate_limiter import PRIORITY_BACKGROUND, RateLimitExceeded, get_rate_limiter
+
+# Every model call in the process goes through here and on to the shared
+# backend (see llm_backends; the OpenAI backend keeps one client and so one
+# keep-alive HTTP connection pool). Deadlines, backoff and the circuit
+# breaker below are the only retry policy. Point OPENAI_BASE_URL at a local
+# stub server, or set GENAI_LLM_BACKEND=stub, to exercise this offline.
+
+DEFAULT_TIMEOUT_SECONDS = 30.0
+MAX_RETRIES = 2
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30.0
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Completion tokens reserved per call on top of the prompt
+COMPLETION_TOKENS_ESTIMATE = 400
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the API while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After `failure_threshold` retryable failures in a row the breaker opens
+    and calls fail fast for `reset_seconds`. After that a single trial call
+    is let through (half-open); its outcome closes or re-opens the breaker.
+    Rate limiting (HTTP 429) is not counted: it means we are being
+    throttled, not that the service is unhealthy.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_throttled(self):
+        # Rate limited: says nothing about service health, so the failure
+        # count is left alone; only a half-open trial slot is given back
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker()
+
+def is_retryable(exc):
+    """Connection problems, timeouts, rate limits and 5xx responses are worth retrying."""
+    if isinstance(exc, (APIConnectionError, TimeoutError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def is_rate_limited(exc):
+    """HTTP 429: retried with backoff but not counted against the circuit breaker."""
+    return isinstance(exc, APIStatusError) and exc.status_code == 429
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given (0-based) retry attempt."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+def _call_with_retries(call, deadline, tokens, priority):
+    """
+    Run `call(timeout)` with rate limiting, retries, backoff and the
+    circuit breaker, the whole thing bounded by `deadline` seconds. Each
+    attempt first waits for one request and `tokens` tokens of capacity
+    from the process-wide limiter, in `priority` order.
+    """
+    start = time.monotonic()
+    attempt = 0
+    while True:
+        remaining = deadline - (time.monotonic() - start)
+        if remaining <= 0:
+            raise TimeoutError(f"Model call exceeded its {deadline:.0f}s deadline")
+        get_rate_limiter().acquire(tokens, priority=priority, timeout=remaining)
+
+        remaining = deadline - (time.monotonic() - start)
+        if not breaker.allow():
+            raise CircuitOpenError(
+                "The AI service is temporarily unavailable after repeated errors. Please try again shortly."
+            )
+
+        try:
+            result = call(remaining)
+        except Exception as e:
+            if not is_retryable(e):
+                # Not a service health problem (bad request, auth, ...)
+                breaker.record_success()
+                raise
+            if is_rate_limited(e):
+                breaker.record_throttled()
+            else:
+                breaker.record_failure()
+
+            delay = backoff_delay(attempt)
+            remaining = deadline - (time.monotonic() - start)
+            if attempt >= MAX_RETRIES or delay >= remaining:
+                raise
+            attempt += 1
+            time.sleep(delay)
+            continue
+
+        breaker.record_success()
+        return result
+
+
+def estimate_tokens(messages):
+    """Tokens to reserve with the rate limiter: the prompt plus a typical completion."""
+    return count_message_tokens(messages) + COMPLETION_TOKENS_ESTIMATE
+
+
+def complete_chat(messages, model, temperature, deadline=DEFAULT_TIMEOUT_SECONDS,
+                  priority=PRIORITY_BACKGROUND, usage=None):
+    """
+    Return the reply text for a chat request on the shared backend.
+
+    The whole call, retries and backoff included, is bounded by `deadline`
+    seconds. Retryable failures are retried up to MAX_RETRIES times with
+    jittered backoff and (except rate limiting) counted by the circuit
+    breaker; while the breaker
+    is open this raises CircuitOpenError immediately. `priority` (see
+    rate_limiter) decides who goes first when calls queue for capacity.
+    Token usage is written into the optional `usage` dict.
+    """
+    backend = get_backend()
+    return _call_with_retries(
+        lambda timeout: backend.complete(messages, model, temperature, timeout, usage),
+        deadline,
+        estimate_tokens(messages),
+        priority,
+    )
+
+
+def stream_chat(messages, model, temperature, deadline=DEFAULT_TIMEOUT_SECONDS,
+                priority=PRIORITY_BACKGROUND, usage=None):
+    """
+    Open a streaming chat request on the shared backend and return an
+    iterator of reply text chunks. Opening the stream gets the same
+    deadline, rate-limit, retry and circuit-breaker handling as `complete_chat`.
+    """
+    backend = get_backend()
+    return _call_with_retries(
+        lambda timeout: backend.stream(messages, model, temperature, timeout, usage),
+        deadline,
+        estimate_tokens(messages),
+        priority,
+    )
+
+
+def friendly_error_message(exc):
+    """A short, user-facing explanation of a failed model call."""
+    if isinstance(exc, (RateLimitExceeded, RateLimitError)):
+        return "The AI service is busy right now. Please try again in a minute."
+    if isinstance(exc, CircuitOpenError):
+        return str(exc)
+    if isinstance(exc, (TimeoutError, APITimeoutError)):
+        return "The AI service took too long to respond. Please try again."
+    if isinstance(exc, APIConnectionError):
+        return "The AI service could not be reached. Please check your connection and try again."
+    return f"There was an error calling the model: {exc}"
@@ -0,0 +1,165 @@
+import argparse
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_PATH = "llm_metrics.jsonl"
+
+# USD per 1M (prompt, completion) tokens
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+_write_lock = threading.Lock()
+
+
+def call_cost(model, prompt_tokens, completion_tokens, backend="openai"):
+    """
+    Estimated USD cost of a call, or None for models without a price and
+    for calls that never reached the OpenAI API (e.g. the stub backend).
+    """
+    if backend != "openai":
+        return None
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+class CallRecord:
+    """Mutable record for one model call, filled in while the call runs."""
+
+    def __init__(self, purpose, model, backend):
+        self.purpose = purpose
+        self.model = model
+        self.backend = backend
+        self.cache = "miss"
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.first_token_ms = None
+        self.error = None
+        self._start = time.perf_counter()
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self._start) * 1000
+
+    def first_token(self):
+        if self.first_token_ms is None:
+            self.first_token_ms = self.elapsed_ms()
+
+    def as_dict(self):
+        return {
+            "ts": time.time(),
+            "purpose": self.purpose,
+            "model": self.model,
+            "backend": self.backend,
+            "cache": self.cache,
+            "latency_ms": round(self.elapsed_ms(), 1),
+            "first_token_ms": None if self.first_token_ms is None else round(self.first_token_ms, 1),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": call_cost(self.model, self.prompt_tokens, self.completion_tokens, self.backend),
+            "error": self.error,
+        }
+
+
+def record(row, path=METRICS_PATH):
+    """Append one metrics row to the JSONL sink."""
+    line = json.dumps(row, ensure_ascii=False) + "\n"
+    with _write_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+@contextmanager
+def track_call(purpose, model, backend, path=METRICS_PATH):
+    """
+    Time a model call and append its record to the metrics sink on exit,
+    including the exception class if the call failed.
+    """
+    call = CallRecord(purpose, model, backend)
+    try:
+        yield call
+    except GeneratorExit:
+        call.error = "Abandoned"
+        raise
+    except BaseException as e:
+        call.error = type(e).__name__
+        raise
+    finally:
+        try:
+            record(call.as_dict(), path)
+        except OSError as e:
+            print("Failed to write LLM metrics:", e)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def summarize(path=METRICS_PATH):
+    """Per-purpose summary rows: calls, errors, cache hits, latency percentiles, tokens and cost."""
+    groups = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                groups.setdefault(row["purpose"], []).append(row)
+
+    summary = []
+    for purpose, rows in sorted(groups.items()):
+        latencies = [r["latency_ms"] for r in rows]
+        summary.append(
+            {
+                "purpose": purpose,
+                "calls": len(rows),
+                "errors": sum(1 for r in rows if r["error"]),
+                "cache_hits": sum(1 for r in rows if r["cache"] != "miss"),
+                "p50_ms": _percentile(latencies, 50),
+                "p95_ms": _percentile(latencies, 95),
+                "prompt_tokens": sum(r["prompt_tokens"] for r in rows),
+                "completion_tokens": sum(r["completion_tokens"] for r in rows),
+                "cost_usd": sum(r["cost_usd"] or 0 for r in rows),
+            }
+        )
+    return summary
+
+
+def slowest(path=METRICS_PATH, limit=5):
+    """The slowest uncached calls, to spot slow paths and expensive prompts."""
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    rows = [r for r in rows if r["cache"] == "miss"]
+    return sorted(rows, key=lambda r: r["latency_ms"], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize model-call metrics")
+    parser.add_argument("--path", default=METRICS_PATH)
+    args = parser.parse_args()
+
+    header = f"{'purpose':<22}{'calls':>7}{'errors':>8}{'cached':>8}{'p50 ms':>9}{'p95 ms':>9}" \
+             f"{'prompt tok':>12}{'compl tok':>11}{'cost $':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in summarize(args.path):
+        print(
+            f"{row['purpose']:<22}{row['calls']:>7}{row['errors']:>8}{row['cache_hits']:>8}"
+            f"{row['p50_ms']:>9.0f}{row['p95_ms']:>9.0f}{row['prompt_tokens']:>12}"
+            f"{row['completion_tokens']:>11}{row['cost_usd']:>10.4f}"
+        )
+
+    print("\nSlowest uncached calls:")
+    for row in slowest(args.path):
+        print(
+            f"  {row['purpose']:<20} {row['latency_ms']:>8.0f} ms  "
+            f"{row['prompt_tokens']} prompt / {row['completion_tokens']} completion tokens"
+            f"{'  error: ' + row['error'] if row['error'] else ''}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import unicodedata
+import zlib
+from functools import lru_cache
+
+from genomics_interpreter import _cached_fragment, category_groups, trait_effect_score
+
+# A dependency-free PDF writer for the trait report. It uses the standard
+# Helvetica fonts (built into every PDF viewer, so nothing is embedded)
+# with WinAnsiEncoding, and measures text with their AFM glyph widths.
+
+PAGE_WIDTH = 612  # US Letter, in points
+PAGE_HEIGHT = 792
+MARGIN = 54
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+CARD_PADDING = 9
+
+FONTS = {"regular": "F1", "bold": "F2"}
+
+DARK = (0.067, 0.094, 0.153)
+GRAY = (0.294, 0.333, 0.388)
+LIGHT_GRAY = (0.42, 0.447, 0.502)
+ACCENT = (0.263, 0.22, 0.792)
+CARD_FILL = (0.976, 0.98, 0.984)
+CARD_STROKE = (0.898, 0.906, 0.922)
+BAR_TRACK = (0.898, 0.906, 0.922)
+BAR_FILL = (0.388, 0.4, 0.945)
+
+DISCLAIMER = (
+    "Important: This report is for educational and informational purposes only. It does not provide "
+    "medical advice, diagnosis, or treatment. Genetics is one factor among many including environment, "
+    "sleep, stress, and medical history. For any health related questions, talk with a licensed "
+    "healthcare provider or genetic counselor."
+)
+
+# Glyph widths (1/1000 em) for printable ASCII, 0x20-0x7E, from the Adobe AFM files
+_HELVETICA_ASCII = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_HELVETICA_BOLD_ASCII = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+# Punctuation above 0x7F in WinAnsi: (regular, bold)
+_WINANSI_EXTRA = {
+    0x80: (556, 556), 0x85: (1000, 1000), 0x91: (222, 278), 0x92: (222, 278),
+    0x93: (333, 500), 0x94: (333, 500), 0x95: (350, 350), 0x96: (556, 556),
+    0x97: (1000, 1000), 0xA0: (278, 278), 0xB0: (400, 400), 0xB7: (278, 278),
+    0xD7: (584, 584),
+}
+
+
+def _width_table(ascii_widths, column):
+    table = [556] * 256
+    table[0x20:0x7F] = ascii_widths
+    for code in range(0x80, 0x100):
+        if code in _WINANSI_EXTRA:
+            table[code] = _WINANSI_EXTRA[code][column]
+            continue
+        try:
+            char = bytes([code]).decode("cp1252")
+        except UnicodeDecodeError:
+            continue
+        # Accented letters take the width of their base letter
+        base = unicodedata.normalize("NFKD", char)[:1]
+        if base and " " <= base <= "~":
+            table[code] = ascii_widths[ord(base) - 0x20]
+    return table
+
+
+# Font metrics are computed once at import
+WIDTHS = {
+    "regular": _width_table(_HELVETICA_ASCII, 0),
+    "bold": _width_table(_HELVETICA_BOLD_ASCII, 1),
+}
+
+
+# Characters outside WinAnsi that appear in trait explanations
+_TRANSLITERATE = str.maketrans(
+    {"α": "alpha", "β": "beta", "γ": "gamma", "δ": "delta", "≥": ">=", "≤": "<=", "→": "->", "\u2011": "-"}
+)
+
+
+@lru_cache(maxsize=16384)
+def _encode(text):
+    """Text as a WinAnsi (cp1252) byte string decoded 1:1 to str; unsupported characters become '?'."""
+    return text.translate(_TRANSLITERATE).encode("cp1252", errors="replace").decode("latin-1")
+
+
+@lru_cache(maxsize=16384)
+def _word_width(font, word):
+    table = WIDTHS[font]
+    return sum(table[ord(c)] for c in _encode(word))
+
+
+def wrap(text, font, size, width):
+    """Greedy word wrap of `text` into lines no wider than `width` points."""
+    space = WIDTHS[font][0x20]
+    limit = width * 1000 / size
+    lines = []
+    for paragraph in text.split("\n"):
+        words = paragraph.split()
+        if not words:
+            lines.append("")
+            continue
+        line, line_width = [], 0
+        for word in words:
+            w = _word_width(font, word)
+            if line and line_width + space + w > limit:
+                lines.append(" ".join(line))
+                line, line_width = [], 0
+            line_width += (space if line else 0) + w
+            line.append(word)
+        lines.append(" ".join(line))
+    return lines
+
+
+def _text_ops(text, font, size, color, width, leading=1.3):
+    return [("text", font, size, color, _encode(line), size * leading) for line in wrap(text, font, size, width)]
+
+
+def _ops_height(ops):
+    return sum(op[-1] for op in ops)
+
+
+def _card_ops(t):
+    """Layout of one trait card: text lines and the effect bar, without positions."""
+    width = CONTENT_WIDTH - 2 * CARD_PADDING
+    return tuple(
+        _text_ops(t["trait_name"], "bold", 11, DARK, width)
+        + _text_ops(
+            f"Gene: {t['gene']} ({t['rsid']}) · Genotype: {t['user_genotype']}", "regular", 8.5, LIGHT_GRAY, width
+        )
+        + [("gap", 3)]
+        + _text_ops(f"Effect: {t['effect_label']}  [{t['effect_level']}]", "regular", 9.5, DARK, width)
+        + [("bar", trait_effect_score(t), 10)]
+        + _text_ops(t["explanation"], "regular", 9.5, DARK, width)
+        + [("gap", 2)]
+        + _text_ops(f"Evidence level: {t['evidence_strength']}", "regular", 8.5, LIGHT_GRAY, width)
+    )
+
+
+def _escape(s):
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _rgb(color, op):
+    return f"{color[0]:.3f} {color[1]:.3f} {color[2]:.3f} {op}"
+
+
+class _Canvas:
+    """Collects page content streams, starting a new page when space runs out."""
+
+    def __init__(self):
+        self.pages = []
+        self.out = None
+        self.y = 0
+        self.new_page()
+
+    def new_page(self):
+        self.out = []
+        self.pages.append(self.out)
+        self.y = PAGE_HEIGHT - MARGIN
+        self.out.append(
+            f"BT /F1 8 Tf {_rgb(LIGHT_GRAY, 'rg')} {MARGIN} {MARGIN / 2:.1f} Td "
+            f"(Genetic Trait Report - page {len(self.pages)}) Tj ET"
+        )
+
+    def ensure(self, height):
+        if self.y - height < MARGIN and self.y < PAGE_HEIGHT - MARGIN:
+            self.new_page()
+
+    def draw(self, ops, x):
+        for op in ops:
+            if op[0] == "text":
+                _, font, size, color, text, leading = op
+                self.ensure(leading)
+                self.y -= leading
+                self.out.append(
+                    f"BT /{FONTS[font]} {size} Tf {_rgb(color, 'rg')} {x:.1f} {self.y + leading - size:.1f} Td "
+                    f"({_escape(text)}) Tj ET"
+                )
+            elif op[0] == "bar":
+                _, percent, height = op
+                self.ensure(height)
+                self.y -= height
+                bar_width = CONTENT_WIDTH - 2 * CARD_PADDING
+                top = self.y + 3
+                self.out.append(f"{_rgb(BAR_TRACK, 'rg')} {x:.1f} {top:.1f} {bar_width:.1f} 5 re f")
+                self.out.append(f"{_rgb(BAR_FILL, 'rg')} {x:.1f} {top:.1f} {bar_width * percent / 100:.1f} 5 re f")
+            else:
+                self.ensure(op[1])
+                self.y -= op[1]
+
+    def card(self, ops):
+        height = _ops_height(ops) + 2 * CARD_PADDING
+        # Keep a card on one page unless it is taller than a page
+        self.ensure(height)
+        if self.y - height >= MARGIN:
+            self.out.append(
+                f"{_rgb(CARD_FILL, 'rg')} {_rgb(CARD_STROKE, 'RG')} 0.7 w "
+                f"{MARGIN} {self.y - height:.1f} {CONTENT_WIDTH} {height:.1f} re B"
+            )
+        self.y -= CARD_PADDING
+        self.draw(ops, MARGIN + CARD_PADDING)
+        self.y -= CARD_PADDING + 6
+
+
+def render_pdf_report(report, ai_summary=None):
+    """
+    Render the trait report (with the AI overview if given) as PDF bytes.
+    Card layouts are cached with the HTML and text fragments, so a
+    typical report takes a few milliseconds.
+    """
+    canvas = _Canvas()
+    canvas.draw(_text_ops("Genetic Trait Summary", "bold", 20, DARK, CONTENT_WIDTH), MARGIN)
+    canvas.draw(
+        _text_ops(
+            f"Traits interpreted: {report['summary']['num_traits_found']}  ·  "
+            f"Categories: {', '.join(report['summary']['categories'])}",
+            "regular",
+            9.5,
+            GRAY,
+            CONTENT_WIDTH,
+        ),
+        MARGIN,
+    )
+
+    if ai_summary:
+        canvas.draw([("gap", 10)], MARGIN)
+        canvas.draw(_text_ops("PERSONALIZED OVERVIEW", "bold", 8, LIGHT_GRAY, CONTENT_WIDTH), MARGIN)
+        canvas.draw(_text_ops(ai_summary, "regular", 10, DARK, CONTENT_WIDTH, leading=1.4), MARGIN)
+
+    db_version = report.get("db_version")
+    for category, traits in category_groups(report):
+        heading = _text_ops(category, "bold", 14, ACCENT, CONTENT_WIDTH)
+        first = _cached_fragment("pdf", _card_ops, traits[0], db_version)
+        # Keep the heading with its first card
+        canvas.ensure(16 + _ops_height(heading) + _ops_height(first) + 2 * CARD_PADDING)
+        canvas.draw([("gap", 16)] + heading + [("gap", 4)], MARGIN)
+        for t in traits:
+            canvas.card(_cached_fragment("pdf", _card_ops, t, db_version))
+
+    canvas.draw([("gap", 12)], MARGIN)
+    canvas.draw(_text_ops(DISCLAIMER, "regular", 8, LIGHT_GRAY, CONTENT_WIDTH), MARGIN)
+
+    return _write_pdf(canvas.pages)
+
+
+def _write_pdf(pages):
+    """Assemble page content streams into a complete PDF file."""
+    objects = [
+        None,  # 1: catalog, filled in once the page ids are known
+        None,  # 2: page tree
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+        b"<< /Producer (GenAI Engine) /Title (Genetic Trait Report) >>",
+    ]
+    page_ids = []
+    for content in pages:
+        stream = zlib.compress("\n".join(content).encode("latin-1"))
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(len(objects) + 1)
+        objects.append(
+            (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {len(objects)} 0 R >>"
+            ).encode("ascii")
+        )
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("ascii")
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
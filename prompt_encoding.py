@@ -0,0 +1,98 @@
+import math
+import re
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character-based estimate
+    tiktoken = None
+
+DEFAULT_TOKEN_BUDGET = 1200
+
+# Roughly 4 characters per token for English text with GPT-style tokenizers
+CHARS_PER_TOKEN = 4
+
+EVIDENCE_RANK = {"strong": 0, "moderate": 1, "emerging": 2}
+
+_encoders = {}
+_FIRST_SENTENCE = re.compile(r"^(.+?[.!?])(\s|$)")
+
+
+def _encoder(model):
+    if model not in _encoders:
+        try:
+            _encoders[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encoders[model] = tiktoken.get_encoding("o200k_base")
+    return _encoders[model]
+
+
+def count_tokens(text, model="gpt-4o-mini"):
+    """Token count for `text` (exact with tiktoken installed, estimated otherwise)."""
+    if tiktoken is not None:
+        return len(_encoder(model).encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def count_message_tokens(messages, model="gpt-4o-mini"):
+    """Approximate prompt tokens for a list of chat messages (content plus per-message overhead)."""
+    return sum(count_tokens(m["content"], model) + 4 for m in messages)
+
+
+def first_sentence(text):
+    match = _FIRST_SENTENCE.match(text.strip())
+    return match.group(1) if match else text.strip()
+
+
+def _trait_line(t, detail):
+    """One trait, at decreasing detail levels: 2 = short explanation, 1 = tags, 0 = label only."""
+    line = f"- {t['trait_name']}: {t['effect_label']}"
+    if detail >= 1:
+        line += f" ({t['effect_level']}, {t['evidence_strength']})"
+    if detail >= 2 and t.get("explanation"):
+        line += f" {first_sentence(t['explanation'])}"
+    return line
+
+
+def _render(traits, detail, omitted, header=True):
+    by_cat = {}
+    for t in traits:
+        by_cat.setdefault(t["category"], []).append(t)
+
+    lines = []
+    if header:
+        lines.append(f"Traits: {len(traits) + omitted} | Categories: {', '.join(sorted(by_cat))}")
+    for category in sorted(by_cat):
+        lines.append(f"[{category}]")
+        lines.extend(_trait_line(t, detail) for t in by_cat[category])
+    if omitted:
+        lines.append(f"(+{omitted} lower-evidence traits omitted)")
+    return "\n".join(lines)
+
+
+def encode_report(report, token_budget=DEFAULT_TOKEN_BUDGET, model="gpt-4o-mini", header=True):
+    """
+    Compact, token-budgeted text encoding of a report object for prompts.
+
+    IDs, rsIDs, genes and genotypes are dropped (the prompts tell the model
+    not to mention them anyway), traits are grouped under category headers
+    and explanations are cut to their first sentence. If that does not fit
+    `token_budget`, explanations and then tags are dropped, and finally the
+    lowest-evidence traits are left out. `header=False` drops the leading
+    trait-count line, for callers that describe the report themselves.
+    """
+    traits = report["traits"]
+    for detail in (2, 1, 0):
+        text = _render(traits, detail, 0, header)
+        if count_tokens(text, model) <= token_budget:
+            return text
+
+    # Even labels alone are over budget: keep the best-evidenced traits
+    ranked = sorted(traits, key=lambda t: EVIDENCE_RANK.get(t["evidence_strength"], len(EVIDENCE_RANK)))
+    lo, hi = 0, len(ranked)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(_render(ranked[:mid], 0, len(ranked) - mid, header), model) <= token_budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return _render(ranked[:lo], 0, len(ranked) - lo, header)
@@ -0,0 +1,135 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+
+# Lower numbers are served first when calls are waiting for capacity
+PRIORITY_CHAT = 0
+PRIORITY_OVERVIEW = 1
+PRIORITY_PLAN = 2
+PRIORITY_BACKGROUND = 3
+
+# Provider limits for the account; 0 disables that limit.
+# Override with GENAI_LLM_RPM / GENAI_LLM_TPM.
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 200_000
+
+
+class RateLimitExceeded(RuntimeError):
+    """Raised when a call could not get rate-limit capacity before its deadline."""
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `per_minute` / 60 per second."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` is available (0 if it already is)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Process-wide request and token limiter with priority scheduling.
+
+    Every model call asks for one request plus its estimated tokens. Only
+    the highest-priority waiter (lowest number, then first come) may take
+    capacity, so a chat reply queued behind background summaries jumps
+    ahead of them, while callers of equal priority stay FIFO.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def _wait_time(self, tokens, now):
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+    def acquire(self, tokens, priority=PRIORITY_BACKGROUND, timeout=None):
+        """
+        Block until one request and `tokens` tokens are available for this
+        caller, respecting priority order. Raises RateLimitExceeded if that
+        takes longer than `timeout` seconds.
+        """
+        if self.requests is None and self.tokens is None:
+            return
+
+        entry = (priority, next(self._seq))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            # A new higher-priority waiter may displace the current head
+            self._cond.notify_all()
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self._waiters[0] == entry:
+                        wait = self._wait_time(tokens, now)
+                        if wait <= 0:
+                            if self.requests is not None:
+                                self.requests.take(1)
+                            if self.tokens is not None:
+                                self.tokens.take(tokens)
+                            return
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0 or (wait is not None and wait > remaining):
+                            raise RateLimitExceeded(
+                                "The AI service is busy right now. Please try again in a minute."
+                            )
+                        wait = remaining if wait is None else wait
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+
+def limiter_from_env():
+    return RateLimiter(
+        requests_per_minute=int(os.environ.get("GENAI_LLM_RPM", DEFAULT_REQUESTS_PER_MINUTE)),
+        tokens_per_minute=int(os.environ.get("GENAI_LLM_TPM", DEFAULT_TOKENS_PER_MINUTE)),
+    )
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """The process-wide limiter shared by every Streamlit session."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = limiter_from_env()
+        return _limiter
+
+
+def set_rate_limiter(limiter):
+    global _limiter
+    with _limiter_lock:
+        _limiter = limiter
@@ -0,0 +1,196 @@
+import csv
+import json
+import os
+import shutil
+
+from genomics_interpreter import trait_effect_score
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for Parquet exports
+    pa = None
+    pq = None
+
+# One row per (sample, trait), in this column order
+EXPORT_COLUMNS = [
+    "sample_id",
+    "trait_id",
+    "trait_name",
+    "category",
+    "rsid",
+    "gene",
+    "user_genotype",
+    "effect_label",
+    "effect_level",
+    "effect_score",
+    "evidence_strength",
+    "explanation",
+]
+
+# Rows buffered before each write (one Parquet row group per batch)
+DEFAULT_BATCH_ROWS = 50_000
+
+
+def report_rows(sample_id, report):
+    """Flat export rows for one sample's report."""
+    for t in report["traits"]:
+        yield {
+            "sample_id": sample_id,
+            "trait_id": t["trait_id"],
+            "trait_name": t["trait_name"],
+            "category": t["category"],
+            "rsid": t["rsid"],
+            "gene": t["gene"],
+            "user_genotype": t["user_genotype"],
+            "effect_label": t["effect_label"],
+            "effect_level": t["effect_level"],
+            "effect_score": trait_effect_score(t),
+            "evidence_strength": t["evidence_strength"],
+            "explanation": t["explanation"],
+        }
+
+
+class _BatchedWriter:
+    """Buffers rows and hands them to `_write_batch` `batch_size` at a time.
+
+    Rows go to `<path>.tmp`, which replaces `path` only when the writer is
+    closed without an error, so re-running an export rewrites the file
+    instead of adding to it. With `mode="a"` the existing file's rows are
+    kept and the new rows follow them.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_ROWS, mode="w"):
+        if mode not in ("w", "a"):
+            raise ValueError(f"Unsupported export mode {mode!r} (expected 'w' or 'a')")
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.batch_size = batch_size
+        self.mode = mode
+        self.rows_written = 0
+        self._batch = []
+        self._opened = False
+
+    @property
+    def appending(self):
+        return self.mode == "a" and os.path.exists(self.path)
+
+    def write_report(self, sample_id, report):
+        for row in report_rows(sample_id, report):
+            self._batch.append(row)
+            if len(self._batch) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        if self._batch:
+            self._ensure_open()
+            self._write_batch(self._batch)
+            self.rows_written += len(self._batch)
+            self._batch = []
+
+    def _ensure_open(self):
+        if not self._opened:
+            self._open()
+            self._opened = True
+
+    def close(self):
+        self.flush()
+        # No rows at all: still leave a valid (empty) file behind
+        self._ensure_open()
+        self._close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        """Drop everything written so far, leaving `path` as it was."""
+        if self._opened:
+            self._close()
+            os.remove(self.tmp_path)
+        self._batch = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class JsonlWriter(_BatchedWriter):
+    """Writes rows as JSON lines."""
+
+    def _open(self):
+        if self.appending:
+            shutil.copyfile(self.path, self.tmp_path)
+        self._file = open(self.tmp_path, self.mode, encoding="utf-8")
+
+    def _write_batch(self, rows):
+        self._file.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+    def _close(self):
+        self._file.close()
+
+
+class CsvWriter(_BatchedWriter):
+    """Writes rows to a CSV file, with the header only at the top of a new file."""
+
+    def _open(self):
+        new_file = True
+        if self.appending:
+            shutil.copyfile(self.path, self.tmp_path)
+            new_file = os.path.getsize(self.tmp_path) == 0
+        self._file = open(self.tmp_path, self.mode, newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=EXPORT_COLUMNS)
+        if new_file:
+            self._writer.writeheader()
+
+    def _write_batch(self, rows):
+        self._writer.writerows(rows)
+
+    def _close(self):
+        self._file.close()
+
+
+class ParquetWriter(_BatchedWriter):
+    """Writes one Parquet file, one row group per batch (needs pyarrow).
+
+    Parquet files cannot be appended to in place, so with `mode="a"` the
+    existing row groups are copied into the new file before any new rows.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_ROWS, mode="w"):
+        if pa is None:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        super().__init__(path, batch_size, mode)
+        self.schema = pa.schema(
+            [(name, pa.int16() if name == "effect_score" else pa.string()) for name in EXPORT_COLUMNS]
+        )
+
+    def _open(self):
+        self._writer = pq.ParquetWriter(self.tmp_path, self.schema, compression="zstd")
+        if self.appending:
+            existing = pq.ParquetFile(self.path)
+            for i in range(existing.num_row_groups):
+                self._writer.write_table(existing.read_row_group(i).cast(self.schema))
+
+    def _write_batch(self, rows):
+        columns = {name: [row[name] for row in rows] for name in EXPORT_COLUMNS}
+        self._writer.write_table(pa.Table.from_pydict(columns, schema=self.schema))
+
+    def _close(self):
+        self._writer.close()
+
+
+WRITERS = {".jsonl": JsonlWriter, ".csv": CsvWriter, ".parquet": ParquetWriter}
+
+
+def open_writer(path, batch_size=DEFAULT_BATCH_ROWS, mode="w"):
+    """
+    Writer for `path`, chosen by its extension (.jsonl, .csv or .parquet).
+    `mode="w"` (the default) replaces the file; `mode="a"` adds to it.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in WRITERS:
+        raise ValueError(f"Unsupported export format {ext!r} (expected {', '.join(WRITERS)})")
+    return WRITERS[ext](path, batch_size, mode)
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import time
+
+from sqlite_conn import connect
+
+REPORT_STORE_PATH = "report_store.sqlite3"
+
+
+def genome_hash(data):
+    """Content hash of an uploaded genotype file (raw bytes)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ReportStore:
+    """Local SQLite store of finished reports.
+
+    Rows are keyed by (genome hash, trait DB version), so the same upload
+    against the same trait database is served from disk, while any change
+    to the database naturally misses and gets recomputed.
+    """
+
+    def __init__(self, path=REPORT_STORE_PATH):
+        self.path = path
+        with connect(self.path) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS reports (
+                    genome_hash TEXT NOT NULL,
+                    db_version TEXT NOT NULL,
+                    report_json TEXT NOT NULL,
+                    ai_summary TEXT,
+                    text_report TEXT,
+                    html_report TEXT,
+                    lifestyle_plan TEXT,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (genome_hash, db_version)
+                )
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(reports)")}
+            if "lifestyle_plan" not in columns:
+                # Stores created before lifestyle plans were persisted
+                conn.execute("ALTER TABLE reports ADD COLUMN lifestyle_plan TEXT")
+
+    def get(self, genome_hash, db_version):
+        """
+        Return the stored entry as a dict with keys report, ai_summary,
+        text_report, html_report, lifestyle_plan and created_at, or None
+        on a miss.
+        """
+        with connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT report_json, ai_summary, text_report, html_report, lifestyle_plan, created_at "
+                "FROM reports WHERE genome_hash = ? AND db_version = ?",
+                (genome_hash, db_version),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        report_json, ai_summary, text_report, html_report, lifestyle_plan, created_at = row
+        return {
+            "report": json.loads(report_json),
+            "ai_summary": ai_summary,
+            "text_report": text_report,
+            "html_report": html_report,
+            "lifestyle_plan": lifestyle_plan,
+            "created_at": created_at,
+        }
+
+    def put(self, genome_hash, db_version, report, ai_summary=None, text_report=None, html_report=None,
+            lifestyle_plan=None):
+        """Insert or replace the entry for (genome_hash, db_version)."""
+        with connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO reports "
+                "(genome_hash, db_version, report_json, ai_summary, text_report, html_report, "
+                "lifestyle_plan, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    genome_hash,
+                    db_version,
+                    json.dumps(report, ensure_ascii=False),
+                    ai_summary,
+                    text_report,
+                    html_report,
+                    lifestyle_plan,
+                    time.time(),
+                ),
+            )
+
+    def delete(self, genome_hash, db_version=None):
+        """Drop stored reports for a genome (all DB versions unless one is given)."""
+        with connect(self.path) as conn:
+            if db_version is None:
+                conn.execute("DELETE FROM reports WHERE genome_hash = ?", (genome_hash,))
+            else:
+                conn.execute(
+                    "DELETE FROM reports WHERE genome_hash = ? AND db_version = ?",
+                    (genome_hash, db_version),
+                )
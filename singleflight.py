@@ -0,0 +1,67 @@
+import threading
+
+
+class Abandoned(RuntimeError):
+    """The leader gave up without a result (e.g. a stream closed early); waiters should retry."""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key.
+
+    The first caller for a key becomes the leader and does the work;
+    callers arriving while it is in flight wait and receive the leader's
+    result (or exception). Once the leader finishes the key is released,
+    so later calls start fresh. `coalesced` counts callers that waited.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def begin(self, key):
+        """Return (call, is_leader). A leader must pass the call to `end`."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            return call, True
+
+    def end(self, key, call, result=None, error=None):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.result = result
+        call.error = error
+        call.done.set()
+
+    def do(self, key, fn):
+        """Run `fn()` once for all concurrent callers with the same key."""
+        call, leader = self.begin(key)
+        if not leader:
+            try:
+                return call.wait()
+            except Abandoned:
+                return self.do(key, fn)
+        try:
+            result = fn()
+        except BaseException as e:
+            self.end(key, call, error=e)
+            raise
+        self.end(key, call, result=result)
+        return result
@@ -0,0 +1,18 @@
+import sqlite3
+from contextlib import contextmanager
+
+
+@contextmanager
+def connect(path, timeout=10):
+    """
+    Short-lived SQLite connection as one transaction: committed when the
+    block exits cleanly, rolled back on error, and always closed. Opening
+    a connection per operation keeps the on-disk caches and stores safe to
+    share across Streamlit sessions and worker threads.
+    """
+    conn = sqlite3.connect(path, timeout=timeout)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
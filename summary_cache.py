@@ -0,0 +1,211 @@
+import hashlib
+import json
+import threading
+import time
+
+from sqlite_conn import connect
+
+SUMMARY_CACHE_PATH = "summary_cache.sqlite3"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+# Minimum Jaccard similarity between trait sets for reusing a neighbour's summary.
+# 1.0 turns the nearest-neighbour fallback off (exact fingerprints only).
+DEFAULT_MIN_SIMILARITY = 0.9
+
+
+def trait_set(report):
+    """Canonical, sorted (trait_id, effect_level) pairs of a report's matched traits."""
+    return sorted({(t["trait_id"], t["effect_level"]) for t in report["traits"]})
+
+
+def trait_fingerprint(pairs):
+    """Stable hash of a canonical trait set."""
+    payload = json.dumps(pairs, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _category_key(report):
+    return "|".join(report["summary"]["categories"])
+
+
+def jaccard(a, b):
+    a, b = set(a), set(b)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class SummaryCache:
+    """AI summaries shared across users with the same (or nearly the same) traits.
+
+    Summaries are stored under the fingerprint of the matched
+    (trait_id, effect_level) set rather than the raw report, so users whose
+    genotypes differ but land on the same trait interpretations share one
+    summary. On an exact miss, a stored set with the same categories is
+    reused when it is a subset of the user's set (every stored trait is one
+    the user has, at the same effect level) with a Jaccard similarity of at
+    least `min_similarity`, so a reused summary may leave a trait out but
+    never describes a result the user does not have.
+
+    Like LLMCache, entries older than `ttl_seconds` are treated as misses
+    and removed, and once the stored rows exceed `max_bytes` the least
+    recently used are evicted first.
+    """
+
+    def __init__(self, path=SUMMARY_CACHE_PATH, min_similarity=DEFAULT_MIN_SIMILARITY,
+                 ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.min_similarity = min_similarity
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with connect(self.path) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS summaries (
+                    fingerprint TEXT NOT NULL,
+                    db_version TEXT NOT NULL,
+                    category_key TEXT NOT NULL,
+                    set_size INTEGER NOT NULL,
+                    trait_set TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (fingerprint, db_version)
+                )
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(summaries)")}
+            if "last_access" not in columns:
+                # Caches created before entries were sized and expired
+                conn.execute("ALTER TABLE summaries ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE summaries ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+                conn.execute(
+                    "UPDATE summaries SET size = length(CAST(trait_set AS BLOB)) + "
+                    "length(CAST(summary AS BLOB)), last_access = created_at"
+                )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS summaries_neighbours "
+                "ON summaries (db_version, category_key, set_size)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS summaries_lru ON summaries (last_access)")
+
+    def _count(self, kind):
+        with self._lock:
+            setattr(self, kind, getattr(self, kind) + 1)
+
+    def get(self, report, db_version):
+        """
+        Return (summary, similarity) for the report's trait set, where
+        similarity is 1.0 for an exact fingerprint hit, or None on a miss.
+        """
+        pairs = trait_set(report)
+        fingerprint = trait_fingerprint(pairs)
+        now = time.time()
+        with connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT summary, created_at FROM summaries WHERE fingerprint = ? AND db_version = ?",
+                (fingerprint, db_version),
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                conn.execute(
+                    "DELETE FROM summaries WHERE fingerprint = ? AND db_version = ?",
+                    (fingerprint, db_version),
+                )
+                row = None
+            if row is not None:
+                conn.execute(
+                    "UPDATE summaries SET last_access = ? WHERE fingerprint = ? AND db_version = ?",
+                    (now, fingerprint, db_version),
+                )
+                self._count("hits")
+                return row[0], 1.0
+
+            if self.min_similarity >= 1.0 or not pairs:
+                self._count("misses")
+                return None
+
+            # A subset B of A has |A ∩ B| / |A ∪ B| = |B| / |A|, so s*|A| <= |B| <= |A|
+            n = len(pairs)
+            candidates = conn.execute(
+                "SELECT fingerprint, trait_set, summary FROM summaries "
+                "WHERE db_version = ? AND category_key = ? AND set_size BETWEEN ? AND ? "
+                "AND created_at >= ?",
+                (
+                    db_version,
+                    _category_key(report),
+                    n * self.min_similarity,
+                    n,
+                    now - self.ttl_seconds,
+                ),
+            ).fetchall()
+
+            query = {tuple(p) for p in pairs}
+            best = None
+            for stored_fingerprint, stored_set, summary in candidates:
+                stored = {tuple(p) for p in json.loads(stored_set)}
+                if not stored <= query:
+                    # A trait the user lacks, or one at a different effect level
+                    continue
+                similarity = jaccard(query, stored)
+                if similarity >= self.min_similarity and (best is None or similarity > best[1]):
+                    best = (summary, similarity, stored_fingerprint)
+            if best is not None:
+                conn.execute(
+                    "UPDATE summaries SET last_access = ? WHERE fingerprint = ? AND db_version = ?",
+                    (now, best[2], db_version),
+                )
+
+        self._count("near_hits" if best else "misses")
+        return best[:2] if best else None
+
+    def put(self, report, db_version, summary):
+        """Store `summary` for the report's trait set and evict expired / LRU entries beyond max_bytes."""
+        pairs = trait_set(report)
+        stored_set = json.dumps(pairs, ensure_ascii=False)
+        now = time.time()
+        with connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries "
+                "(fingerprint, db_version, category_key, set_size, trait_set, summary, size, "
+                "created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    trait_fingerprint(pairs),
+                    db_version,
+                    _category_key(report),
+                    len(pairs),
+                    stored_set,
+                    summary,
+                    len(stored_set.encode("utf-8")) + len(summary.encode("utf-8")),
+                    now,
+                    now,
+                ),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM summaries WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        to_free = total - self.max_bytes
+        stale = []
+        for fingerprint, db_version, size in conn.execute(
+            "SELECT fingerprint, db_version, size FROM summaries ORDER BY last_access ASC"
+        ).fetchall():
+            if to_free <= 0:
+                break
+            stale.append((fingerprint, db_version))
+            to_free -= size
+        conn.executemany("DELETE FROM summaries WHERE fingerprint = ? AND db_version = ?", stale)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "near_hits": self.near_hits, "misses": self.misses}
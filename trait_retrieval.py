@@ -0,0 +1,163 @@
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+from prompt_encoding import encode_report
+
+DEFAULT_TOP_K = 6
+
+# Retrieved traits scoring below this fraction of the best match are dropped
+MIN_RELATIVE_SCORE = 0.35
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset(
+    "a about am an and any are as at be been but by can could do does for from have how i if in is it its "
+    "me more my of on or should so than that the their them there these they this to was what when which "
+    "who why will with would you your".split()
+)
+
+# Everyday words in questions that the trait database words differently
+QUERY_SYNONYMS = {
+    "coffee": "caffeine",
+    "espresso": "caffeine",
+    "tea": "caffeine",
+    "milk": "lactose dairy",
+    "cheese": "lactose dairy",
+    "beer": "alcohol",
+    "wine": "alcohol",
+    "drinking": "alcohol",
+    "stressed": "stress",
+    "anxious": "stress",
+    "tired": "fatigue sleep",
+    "nap": "sleep",
+    "insomnia": "sleep",
+    "run": "endurance aerobic",
+    "running": "endurance aerobic",
+    "cardio": "endurance aerobic",
+    "gym": "training power",
+    "lifting": "power muscle",
+    "sunburn": "sun",
+    "fish": "omega",
+}
+
+
+def _stem(word):
+    # Plural "s" only; enough to match "traits"/"trait", "genes"/"gene"
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def tokenize(text):
+    """Lowercased word tokens with stop words and one-letter words removed."""
+    return [_stem(w) for w in _WORD.findall(text.lower()) if len(w) > 1 and w not in STOP_WORDS]
+
+
+def expand_query(text):
+    """Add trait-database vocabulary for everyday words in a question."""
+    extra = [QUERY_SYNONYMS[w] for w in _WORD.findall(text.lower()) if w in QUERY_SYNONYMS]
+    return " ".join([text, *extra])
+
+
+def trait_document(trait, explanations=()):
+    """Searchable text for one matched trait, plus the database explanations of its other genotypes."""
+    parts = [
+        trait["trait_name"],
+        trait["category"],
+        trait.get("gene", ""),
+        trait["effect_label"],
+        trait.get("explanation", ""),
+    ]
+    parts.extend(explanations)
+    return " ".join(p for p in parts if p)
+
+
+def database_explanations(trait_lookup):
+    """trait_id -> distinct explanations across every genotype row in the trait database."""
+    by_trait = {}
+    for row in trait_lookup.values():
+        texts = by_trait.setdefault(row["trait_id"], [])
+        if row.get("explanation") and row["explanation"] not in texts:
+            texts.append(row["explanation"])
+    return by_trait
+
+
+class TraitIndex:
+    """TF-IDF index over a report's matched traits, searched by cosine similarity.
+
+    Built once per report (a few milliseconds even for hundreds of traits),
+    then each chatbot question is answered from the top-k matching traits
+    instead of the whole report.
+    """
+
+    def __init__(self, traits, trait_lookup=None):
+        self.traits = list(traits)
+        explanations = database_explanations(trait_lookup) if trait_lookup else {}
+        docs = [
+            Counter(tokenize(trait_document(t, explanations.get(t["trait_id"], ()))))
+            for t in self.traits
+        ]
+
+        self.vocabulary = {}
+        for doc in docs:
+            for word in doc:
+                self.vocabulary.setdefault(word, len(self.vocabulary))
+
+        df = np.zeros(len(self.vocabulary))
+        for doc in docs:
+            for word in doc:
+                df[self.vocabulary[word]] += 1
+        # Smoothed idf, as in scikit-learn's TfidfVectorizer
+        self.idf = np.log((1 + len(docs)) / (1 + df)) + 1
+
+        self.matrix = np.zeros((len(docs), len(self.vocabulary)))
+        for i, doc in enumerate(docs):
+            for word, count in doc.items():
+                self.matrix[i, self.vocabulary[word]] = 1 + math.log(count)
+        self.matrix *= self.idf
+        norms = np.linalg.norm(self.matrix, axis=1, keepdims=True)
+        self.matrix /= np.where(norms == 0, 1, norms)
+
+    def _vector(self, text):
+        vec = np.zeros(len(self.vocabulary))
+        for word, count in Counter(tokenize(text)).items():
+            col = self.vocabulary.get(word)
+            if col is not None:
+                vec[col] = 1 + math.log(count)
+        vec *= self.idf
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def search(self, query, top_k=DEFAULT_TOP_K):
+        """Return up to `top_k` (trait, score) pairs for `query`, best first."""
+        if not self.traits:
+            return []
+        scores = self.matrix @ self._vector(expand_query(query))
+        best = scores.max()
+        if best <= 0:
+            return []
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [
+            (self.traits[i], float(scores[i]))
+            for i in order
+            if scores[i] >= best * MIN_RELATIVE_SCORE
+        ]
+
+    def context(self, query, token_budget, top_k=DEFAULT_TOP_K):
+        """
+        Prompt context for one question: a one-line overview of the report
+        plus the traits most relevant to `query`. Questions that match no
+        trait (greetings, general habits) get the whole report encoded
+        within `token_budget` instead.
+        """
+        categories = sorted({t["category"] for t in self.traits})
+        overview = f"The user has {len(self.traits)} matched traits across: {', '.join(categories)}."
+        hits = [t for t, _ in self.search(query, top_k)]
+        # The overview already gives the trait count; the encoder's own count
+        # line would contradict it for a retrieved subset
+        if not hits:
+            everything = encode_report({"traits": self.traits}, token_budget=token_budget, header=False)
+            return f"{overview}\n{everything}"
+        relevant = encode_report({"traits": hits}, token_budget=token_budget, header=False)
+        return f"{overview}\nTraits most relevant to this question:\n{relevant}"